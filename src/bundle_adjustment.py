@@ -5,33 +5,199 @@ from __future__ import annotations
 import cv2
 import numpy as np
 from scipy.optimize import least_squares
+from scipy.sparse import csr_matrix
 from typing import TYPE_CHECKING
 
+try:
+    from numba import njit, prange
+    HAS_NUMBA = True
+except ImportError:  # numba is optional; the NumPy kernels below are used instead
+    HAS_NUMBA = False
+
 if TYPE_CHECKING:
     from .incremental_sfm import IncrementalMapper
 
 
-def project_points(points_3d: np.ndarray, K: np.ndarray, R: np.ndarray, t: np.ndarray) -> np.ndarray:
-    """
-    Project 3D points to 2D using camera parameters.
-
-    Args:
-        points_3d: Nx3 3D points
-        K: 3x3 intrinsic matrix
-        R: 3x3 rotation matrix
-        t: 3x1 translation vector
-
-    Returns:
-        Nx2 projected 2D points
-    """
-    # Transform to camera coordinates
-    points_cam = (R @ points_3d.T).T + t.ravel()
-
-    # Project to image plane
-    points_proj = (K @ points_cam.T).T
-    points_2d = points_proj[:, :2] / points_proj[:, 2:3]
-
-    return points_2d
+if HAS_NUMBA:
+    # Observations are processed in blocks so that per-observation scratch
+    # matrices are allocated once per block rather than once per observation.
+    _BLOCK = 256
+
+    @njit(cache=True, fastmath=True)
+    def _camera_rotations_numba(camera_params):
+        """
+        Per-camera rotation matrices R and rotation-derivative factors G.
+
+        R = I + a[r]x + b(rr^T - theta^2 I). G is chosen so that
+        d(R X)/dr = -R [X]x G (Gallego & Yezzi): G = (r r^T + (R^T - I)[r]x) / theta^2,
+        which tends to I as theta -> 0.
+        """
+        n_cams = camera_params.shape[0]
+        Rs = np.empty((n_cams, 3, 3))
+        Gs = np.empty((n_cams, 3, 3))
+        for c in range(n_cams):
+            x, y, z = camera_params[c, 0], camera_params[c, 1], camera_params[c, 2]
+            theta2 = x * x + y * y + z * z
+            if theta2 < 1e-24:
+                a, b = 1.0, 0.5
+            else:
+                theta = np.sqrt(theta2)
+                a = np.sin(theta) / theta
+                b = (1.0 - np.cos(theta)) / theta2
+            R = Rs[c]
+            R[0, 0] = 1.0 - b * (y * y + z * z)
+            R[0, 1] = -a * z + b * x * y
+            R[0, 2] = a * y + b * x * z
+            R[1, 0] = a * z + b * x * y
+            R[1, 1] = 1.0 - b * (x * x + z * z)
+            R[1, 2] = -a * x + b * y * z
+            R[2, 0] = -a * y + b * x * z
+            R[2, 1] = a * x + b * y * z
+            R[2, 2] = 1.0 - b * (x * x + y * y)
+
+            G = Gs[c]
+            if theta2 < 1e-24:
+                G[:, :] = np.eye(3)
+                continue
+            r = camera_params[c, :3]
+            for i in range(3):
+                Ri0 = R[0, i] - (1.0 if i == 0 else 0.0)
+                Ri1 = R[1, i] - (1.0 if i == 1 else 0.0)
+                Ri2 = R[2, i] - (1.0 if i == 2 else 0.0)
+                G[i, 0] = (r[i] * r[0] + Ri1 * r[2] - Ri2 * r[1]) / theta2
+                G[i, 1] = (r[i] * r[1] - Ri0 * r[2] + Ri2 * r[0]) / theta2
+                G[i, 2] = (r[i] * r[2] + Ri0 * r[1] - Ri1 * r[0]) / theta2
+        return Rs, Gs
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _residuals_numba(Rs, camera_params, points_3d, camera_indices, point_indices, points_2d, K):
+        n_obs = len(camera_indices)
+        out = np.empty(2 * n_obs)
+        for i in prange(n_obs):
+            c = camera_indices[i]
+            R = Rs[c]
+            X = points_3d[point_indices[i]]
+            pc0 = R[0, 0] * X[0] + R[0, 1] * X[1] + R[0, 2] * X[2] + camera_params[c, 3]
+            pc1 = R[1, 0] * X[0] + R[1, 1] * X[1] + R[1, 2] * X[2] + camera_params[c, 4]
+            pc2 = R[2, 0] * X[0] + R[2, 1] * X[1] + R[2, 2] * X[2] + camera_params[c, 5]
+            q0 = K[0, 0] * pc0 + K[0, 1] * pc1 + K[0, 2] * pc2
+            q1 = K[1, 0] * pc0 + K[1, 1] * pc1 + K[1, 2] * pc2
+            q2 = K[2, 0] * pc0 + K[2, 1] * pc1 + K[2, 2] * pc2
+            out[2 * i] = points_2d[i, 0] - q0 / q2
+            out[2 * i + 1] = points_2d[i, 1] - q1 / q2
+        return out
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _jacobian_data_numba(Rs, Gs, camera_params, points_3d, camera_indices, point_indices, K):
+        n_obs = len(camera_indices)
+        data = np.empty((n_obs, 2, 9))
+        for blk in prange((n_obs + _BLOCK - 1) // _BLOCK):
+            A = np.empty((2, 3))
+            dpc_dr = np.empty((3, 3))
+            for i in range(blk * _BLOCK, min(n_obs, (blk + 1) * _BLOCK)):
+                c = camera_indices[i]
+                R = Rs[c]
+                G = Gs[c]
+                X = points_3d[point_indices[i]]
+                pc0 = R[0, 0] * X[0] + R[0, 1] * X[1] + R[0, 2] * X[2] + camera_params[c, 3]
+                pc1 = R[1, 0] * X[0] + R[1, 1] * X[1] + R[1, 2] * X[2] + camera_params[c, 4]
+                pc2 = R[2, 0] * X[0] + R[2, 1] * X[1] + R[2, 2] * X[2] + camera_params[c, 5]
+                q0 = K[0, 0] * pc0 + K[0, 1] * pc1 + K[0, 2] * pc2
+                q1 = K[1, 0] * pc0 + K[1, 1] * pc1 + K[1, 2] * pc2
+                inv_z = 1.0 / (K[2, 0] * pc0 + K[2, 1] * pc1 + K[2, 2] * pc2)
+
+                # -d(projection)/d(pc); residuals are observed - projected
+                for j in range(3):
+                    A[0, j] = -(K[0, j] - q0 * inv_z * K[2, j]) * inv_z
+                    A[1, j] = -(K[1, j] - q1 * inv_z * K[2, j]) * inv_z
+
+                # d(pc)/dr = -R ([X]x G)
+                for j in range(3):
+                    c0 = X[1] * G[2, j] - X[2] * G[1, j]
+                    c1 = X[2] * G[0, j] - X[0] * G[2, j]
+                    c2 = X[0] * G[1, j] - X[1] * G[0, j]
+                    for k in range(3):
+                        dpc_dr[k, j] = -(R[k, 0] * c0 + R[k, 1] * c1 + R[k, 2] * c2)
+
+                for a in range(2):
+                    for j in range(3):
+                        data[i, a, j] = A[a, 0] * dpc_dr[0, j] + A[a, 1] * dpc_dr[1, j] + A[a, 2] * dpc_dr[2, j]
+                        data[i, a, 3 + j] = A[a, j]
+                        data[i, a, 6 + j] = A[a, 0] * R[0, j] + A[a, 1] * R[1, j] + A[a, 2] * R[2, j]
+        return data
+
+    @njit(fastmath=True, cache=True)
+    def _schur_complement_numba(Y, W, pair_cam, point_ptr, n_cameras):
+        """
+        -sum_p W_p V_p^-1 W_p^T over camera pairs sharing each point, with Y = W V^-1.
+
+        Pairs are grouped by point (point_ptr is a CSR-style pointer), so the
+        work is sum_p k_p^2 for k_p cameras observing point p. The result is
+        symmetric, so only b >= a is evaluated and mirrored.
+        """
+        S = np.zeros((6 * n_cameras, 6 * n_cameras))
+        for p in range(len(point_ptr) - 1):
+            for a in range(point_ptr[p], point_ptr[p + 1]):
+                ra = 6 * pair_cam[a]
+                for b in range(a, point_ptr[p + 1]):
+                    rb = 6 * pair_cam[b]
+                    for i in range(6):
+                        for j in range(6):
+                            v = Y[a, i, 0] * W[b, j, 0] + Y[a, i, 1] * W[b, j, 1] + Y[a, i, 2] * W[b, j, 2]
+                            S[ra + i, rb + j] -= v
+                            if b != a:
+                                S[rb + j, ra + i] -= v
+        return S
+
+    @njit(fastmath=True, cache=True)
+    def _normal_blocks_numba(J, sw, r, camera_indices, point_indices, obs_pair, n_cameras, n_points,
+                             n_pairs):
+        """
+        Weighted J^T J blocks (U, V, W) and gradients (gc, gp) in one pass over observations.
+
+        Rows of J and r are scaled by sw on the fly and accumulated straight into
+        the per-camera, per-point and per-(camera, point) blocks, so no (N, 6, 6)
+        style per-observation products are materialized.
+        """
+        U = np.zeros((n_cameras, 6, 6))
+        V = np.zeros((n_points, 3, 3))
+        W = np.zeros((n_pairs, 6, 3))
+        gc = np.zeros((n_cameras, 6))
+        gp = np.zeros((n_points, 3))
+        row = np.empty(9)
+        for i in range(len(camera_indices)):
+            c = camera_indices[i]
+            p = point_indices[i]
+            q = obs_pair[i]
+            for a in range(2):
+                for k in range(9):
+                    row[k] = J[i, a, k] * sw[i, a]
+                res = r[i, a] * sw[i, a]
+                for k in range(3):
+                    gp[p, k] += row[6 + k] * res
+                    for l in range(3):
+                        V[p, k, l] += row[6 + k] * row[6 + l]
+                if q < 0:  # fixed camera
+                    continue
+                for k in range(6):
+                    gc[c, k] += row[k] * res
+                    for l in range(6):
+                        U[c, k, l] += row[k] * row[l]
+                    for l in range(3):
+                        W[q, k, l] += row[k] * row[6 + l]
+        return U, V, W, gc, gp
+
+
+def _unpack_params(params: np.ndarray,
+                   n_cameras: int,
+                   n_points: int,
+                   fixed_camera_params: np.ndarray | None) -> tuple[np.ndarray, np.ndarray]:
+    """Split the parameter vector; constant cameras are appended after the optimized ones."""
+    camera_params = params[:n_cameras * 6].reshape((n_cameras, 6))
+    points_3d = params[n_cameras * 6:].reshape((n_points, 3))
+    if fixed_camera_params is not None and len(fixed_camera_params):
+        camera_params = np.vstack([camera_params, fixed_camera_params])
+    return camera_params, points_3d
 
 
 def bundle_adjustment_residuals(params: np.ndarray,
@@ -40,10 +206,14 @@ def bundle_adjustment_residuals(params: np.ndarray,
                                  camera_indices: np.ndarray,
                                  point_indices: np.ndarray,
                                  points_2d: np.ndarray,
-                                 K: np.ndarray) -> np.ndarray:
+                                 K: np.ndarray,
+                                 fixed_camera_params: np.ndarray | None = None) -> np.ndarray:
     """
     Compute reprojection residuals for bundle adjustment.
 
+    All observations are projected in one batch: rotation matrices are built
+    once per camera and gathered per observation.
+
     Args:
         params: Flattened parameter vector [camera_params, point_params]
                Each camera: 6 params (3 for rotation as axis-angle, 3 for translation)
@@ -54,137 +224,366 @@ def bundle_adjustment_residuals(params: np.ndarray,
         point_indices: Point index for each observation
         points_2d: Observed 2D points (Nx2)
         K: Intrinsic matrix
+        fixed_camera_params: Optional Fx6 constant cameras, addressed by
+               camera indices n_cameras .. n_cameras + F - 1
 
     Returns:
         Residual vector (2*N_observations,)
     """
-    camera_params = params[:n_cameras * 6].reshape((n_cameras, 6))
-    points_3d = params[n_cameras * 6:].reshape((n_points, 3))
+    camera_params, points_3d = _unpack_params(params, n_cameras, n_points, fixed_camera_params)
 
-    residuals = []
+    if HAS_NUMBA:
+        Rs, _ = _camera_rotations_numba(camera_params)
+        return _residuals_numba(Rs, camera_params, points_3d, camera_indices, point_indices,
+                                points_2d, K.astype(np.float64))
 
-    for i in range(len(camera_indices)):
-        cam_idx = camera_indices[i]
-        pt_idx = point_indices[i]
-        observed = points_2d[i]
+    # One Rodrigues conversion per camera (n_cameras << n_observations)
+    Rs = np.stack([cv2.Rodrigues(camera_params[i, :3])[0] for i in range(len(camera_params))])
+    ts = camera_params[:, 3:6]
 
-        # Get camera parameters
-        rvec = camera_params[cam_idx, :3]
-        tvec = camera_params[cam_idx, 3:6]
+    # Transform to camera coordinates
+    points_cam = np.einsum('nij,nj->ni', Rs[camera_indices], points_3d[point_indices]) + ts[camera_indices]
+
+    # Project to image plane
+    points_proj = points_cam @ K.T
+    projected = points_proj[:, :2] / points_proj[:, 2:3]
+
+    return (points_2d - projected).ravel()
+
+
+def _jacobian_structure(n_cameras: int,
+                        camera_indices: np.ndarray,
+                        point_indices: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray | None]:
+    """
+    Column indices and row pointers of the block-sparse BA Jacobian.
+
+    Every residual row depends on the 6 parameters of its camera followed by
+    the 3 of its point (camera columns always come first). Rows observed by a
+    constant camera (index >= n_cameras) only have the 3 point columns.
+
+    Returns:
+        Tuple of (indices, indptr, entry_mask) in CSR layout; entry_mask selects
+        the stored entries out of a dense (N, 2, 9) block array, or is None
+        when every observation has all 9 entries
+    """
+    camera_indices = np.asarray(camera_indices)
+    n_obs = len(camera_indices)
+    cam_cols = 6 * camera_indices[:, None] + np.arange(6)
+    pt_cols = n_cameras * 6 + 3 * np.asarray(point_indices)[:, None] + np.arange(3)
+    cols = np.repeat(np.hstack([cam_cols, pt_cols])[:, None, :], 2, axis=1)  # (N, 2, 9)
+
+    fixed = camera_indices >= n_cameras
+    if not fixed.any():
+        return cols.ravel(), np.arange(0, 18 * n_obs + 1, 9), None
+
+    entry_mask = np.ones((n_obs, 2, 9), dtype=bool)
+    entry_mask[fixed, :, :6] = False
+    row_nnz = np.repeat(np.where(fixed, 3, 9), 2)
+    indptr = np.concatenate([[0], np.cumsum(row_nnz)])
+    return cols[entry_mask], indptr, entry_mask
+
+
+def bundle_adjustment_sparsity(n_cameras: int,
+                               n_points: int,
+                               camera_indices: np.ndarray,
+                               point_indices: np.ndarray) -> csr_matrix:
+    """
+    Sparsity pattern of the BA Jacobian (for finite-difference estimation).
+
+    Args:
+        n_cameras: Number of cameras
+        n_points: Number of 3D points
+        camera_indices: Camera index for each observation
+        point_indices: Point index for each observation
+
+    Returns:
+        (2*N_observations, 6*n_cameras + 3*n_points) sparse matrix of ones
+    """
+    indices, indptr, _ = _jacobian_structure(n_cameras, camera_indices, point_indices)
+    shape = (2 * len(camera_indices), n_cameras * 6 + n_points * 3)
+    return csr_matrix((np.ones(len(indices), dtype=np.int8), indices, indptr), shape=shape)
+
+
+def bundle_adjustment_jacobian(params: np.ndarray,
+                               n_cameras: int,
+                               n_points: int,
+                               camera_indices: np.ndarray,
+                               point_indices: np.ndarray,
+                               points_2d: np.ndarray,
+                               K: np.ndarray,
+                               fixed_camera_params: np.ndarray | None = None) -> csr_matrix:
+    """
+    Analytic Jacobian of bundle_adjustment_residuals.
+
+    Takes the same arguments as bundle_adjustment_residuals so it can be passed
+    directly as ``jac`` to least_squares.
+
+    Returns:
+        (2*N_observations, 6*n_cameras + 3*n_points) CSR matrix
+    """
+    data = _jacobian_blocks(params, n_cameras, n_points, camera_indices, point_indices, K,
+                            fixed_camera_params)
+    indices, indptr, entry_mask = _jacobian_structure(n_cameras, camera_indices, point_indices)
+    values = data.ravel() if entry_mask is None else data[entry_mask]
+    shape = (2 * len(camera_indices), n_cameras * 6 + n_points * 3)
+    return csr_matrix((values, indices, indptr), shape=shape)
+
+
+def _jacobian_blocks(params: np.ndarray,
+                     n_cameras: int,
+                     n_points: int,
+                     camera_indices: np.ndarray,
+                     point_indices: np.ndarray,
+                     K: np.ndarray,
+                     fixed_camera_params: np.ndarray | None = None) -> np.ndarray:
+    """Dense (N, 2, 9) per-observation Jacobian blocks: 6 camera columns, then 3 point columns."""
+    camera_params, points_3d = _unpack_params(params, n_cameras, n_points, fixed_camera_params)
+
+    if HAS_NUMBA:
+        Rs, Gs = _camera_rotations_numba(camera_params)
+        data = _jacobian_data_numba(Rs, Gs, camera_params, points_3d, camera_indices, point_indices,
+                                    K.astype(np.float64))
+    else:
+        # Rotation matrices and their derivatives w.r.t. the rotation vector;
+        # cv2.Rodrigues returns dR/drvec as a 3x9 matrix (row k = dR/dr_k, R row-major)
+        Rs = np.empty((len(camera_params), 3, 3))
+        dRs = np.empty((len(camera_params), 3, 3, 3))
+        for i in range(len(camera_params)):
+            R, dR = cv2.Rodrigues(camera_params[i, :3])
+            Rs[i] = R
+            dRs[i] = dR.reshape(3, 3, 3)
+        ts = camera_params[:, 3:6]
+
+        R_obs = Rs[camera_indices]
+        X = points_3d[point_indices]
+        points_cam = np.einsum('nij,nj->ni', R_obs, X) + ts[camera_indices]
+        q = points_cam @ K.T
+
+        # d(projection)/d(q) for u = q0/q2, v = q1/q2, chained through q = K @ pc
+        inv_z = 1.0 / q[:, 2]
+        dproj_dq = np.zeros((len(q), 2, 3))
+        dproj_dq[:, 0, 0] = inv_z
+        dproj_dq[:, 1, 1] = inv_z
+        dproj_dq[:, :, 2] = -q[:, :2] * (inv_z ** 2)[:, None]
+        dproj_dpc = dproj_dq @ K
+
+        # d(pc)/d(rvec)[i, k] = sum_j dR[k, i, j] * X[j];  d(pc)/d(t) = I;  d(pc)/d(X) = R
+        dpc_drvec = np.einsum('nkij,nj->nik', dRs[camera_indices], X)
+
+        # Residuals are observed - projected, hence the sign flip
+        data = np.empty((len(q), 2, 9))
+        data[:, :, 0:3] = -dproj_dpc @ dpc_drvec
+        data[:, :, 3:6] = -dproj_dpc
+        data[:, :, 6:9] = -dproj_dpc @ R_obs
+    return data
+
+
+def _loss_weights(residuals: np.ndarray, loss: str, f_scale: float) -> tuple[float, np.ndarray]:
+    """
+    Robust cost and per-residual IRLS weights rho'(z), with z = (r / f_scale)^2.
+
+    Uses the same loss definitions as scipy.optimize.least_squares, so the
+    cost is 0.5 * f_scale^2 * sum(rho(z)).
+    """
+    if loss == 'linear':
+        return 0.5 * float(residuals @ residuals), np.ones_like(residuals)
+    z = (residuals / f_scale) ** 2
+    if loss == 'huber':
+        rho = np.where(z <= 1, z, 2 * np.sqrt(z) - 1)
+        weights = 1.0 / np.sqrt(np.maximum(z, 1.0))
+    elif loss == 'soft_l1':
+        rho = 2 * (np.sqrt(1 + z) - 1)
+        weights = 1.0 / np.sqrt(1 + z)
+    elif loss == 'cauchy':
+        rho = np.log1p(z)
+        weights = 1.0 / (1 + z)
+    else:
+        raise ValueError(f"Unsupported loss for the Schur solver: {loss}")
+    return 0.5 * f_scale ** 2 * float(rho.sum()), weights
+
+
+def _group_matrix(index: np.ndarray, n: int) -> csr_matrix:
+    """Sparse (n x N) 0/1 matrix that sums per-observation rows into n groups."""
+    return csr_matrix((np.ones(len(index)), (index, np.arange(len(index)))), shape=(n, len(index)))
+
+
+def _block_sum(group: csr_matrix, blocks: np.ndarray) -> np.ndarray:
+    """Sum blocks (N, ...) into groups using a matrix from _group_matrix."""
+    return (group @ blocks.reshape(len(blocks), -1)).reshape((group.shape[0],) + blocks.shape[1:])
+
+
+def _schur_complement(Y: np.ndarray,
+                      W: np.ndarray,
+                      pair_cam: np.ndarray,
+                      pair_pt: np.ndarray,
+                      point_ptr: np.ndarray,
+                      n_cameras: int,
+                      n_points: int) -> np.ndarray:
+    """Dense (6C x 6C) -W V^-1 W^T from per-(camera, point) blocks Y = W V^-1 and W."""
+    if HAS_NUMBA:
+        return _schur_complement_numba(Y, W, pair_cam, point_ptr, n_cameras)
+    rows = np.broadcast_to(6 * pair_cam[:, None, None] + np.arange(6)[:, None], W.shape).ravel()
+    cols = np.broadcast_to(3 * pair_pt[:, None, None] + np.arange(3), W.shape).ravel()
+    shape = (6 * n_cameras, 3 * n_points)
+    Y_sp = csr_matrix((Y.ravel(), (rows, cols)), shape=shape)
+    W_sp = csr_matrix((W.ravel(), (rows, cols)), shape=shape)
+    return -(Y_sp @ W_sp.T).toarray()
+
+
+def _normal_blocks(J: np.ndarray,
+                   sw: np.ndarray,
+                   r: np.ndarray,
+                   camera_indices: np.ndarray,
+                   point_indices: np.ndarray,
+                   obs_pair: np.ndarray,
+                   groups: tuple[csr_matrix, csr_matrix, csr_matrix],
+                   n_cameras: int,
+                   n_points: int) -> tuple[np.ndarray, ...]:
+    """
+    Weighted normal-equation blocks of the reprojection problem.
+
+    Args:
+        J: (N, 2, 9) Jacobian blocks from _jacobian_blocks
+        sw: (N, 2) square roots of the IRLS weights
+        r: (N, 2) residuals
+        obs_pair: (camera, point) pair index of each observation, -1 for fixed cameras
+        groups: _group_matrix results for active cameras, points and pairs
+
+    Returns:
+        Tuple of (U (C,6,6), V (P,3,3), W (pairs,6,3), gc (6C,), gp (P,3))
+    """
+    cam_group, point_group, pair_group = groups
+    if HAS_NUMBA:
+        U, V, W, gc, gp = _normal_blocks_numba(J, sw, r, camera_indices, point_indices, obs_pair,
+                                               n_cameras, n_points, pair_group.shape[0])
+        return U, V, W, gc.ravel(), gp
+
+    active = obs_pair >= 0
+    J = J * sw[:, :, None]
+    rw = (r * sw)[:, :, None]
+    Jc_T = J[active, :, :6].transpose(0, 2, 1)
+    Jp_T = J[:, :, 6:].transpose(0, 2, 1)
+    U = _block_sum(cam_group, Jc_T @ Jc_T.transpose(0, 2, 1))
+    V = _block_sum(point_group, Jp_T @ Jp_T.transpose(0, 2, 1))
+    W = _block_sum(pair_group, Jc_T @ Jp_T[active].transpose(0, 2, 1))
+    gc = _block_sum(cam_group, Jc_T @ rw[active]).ravel()
+    gp = _block_sum(point_group, Jp_T @ rw).reshape(n_points, 3)
+    return U, V, W, gc, gp
+
+
+def _damp(blocks: np.ndarray, lam: float) -> np.ndarray:
+    """Marquardt damping: add lam * diag to every square block (diagonal floored at 1e-9)."""
+    damped = blocks.copy()
+    idx = np.arange(blocks.shape[-1])
+    damped[:, idx, idx] += lam * np.maximum(blocks[:, idx, idx], 1e-9)
+    return damped
+
+
+def _solve_schur_lm(params: np.ndarray,
+                    n_cameras: int,
+                    n_points: int,
+                    camera_indices: np.ndarray,
+                    point_indices: np.ndarray,
+                    points_2d: np.ndarray,
+                    K: np.ndarray,
+                    fixed_camera_params: np.ndarray | None,
+                    max_iterations: int,
+                    ftol: float,
+                    xtol: float,
+                    loss: str,
+                    f_scale: float,
+                    verbose: bool) -> tuple[np.ndarray, np.ndarray, int, str]:
+    """
+    Levenberg-Marquardt on the Schur complement of the point blocks.
+
+    Each iteration eliminates the 3x3 point blocks of J^T J and solves the
+    reduced (6C x 6C) camera system densely, then back-substitutes the points,
+    so the linear solve grows with the number of cameras, not of points.
+
+    Returns:
+        Tuple of (x, residuals, n_evaluations, message); n_evaluations counts
+        residual evaluations like least_squares' nfev
+    """
+    args = (n_cameras, n_points, camera_indices, point_indices, points_2d, K, fixed_camera_params)
+    n_obs = len(camera_indices)
+    active = camera_indices < n_cameras  # observations by optimized cameras
+    cam_idx = camera_indices[active]
+
+    # The sparsity structure is fixed, so the grouping matrices are built once.
+    # Camera-point blocks W are summed per (camera, point) pair, with pairs
+    # ordered by point so a range of points maps to a contiguous range of pairs
+    pair_key, pair_idx = np.unique(point_indices[active] * n_cameras + cam_idx, return_inverse=True)
+    pair_pt, pair_cam = np.divmod(pair_key, n_cameras)
+    obs_pair = np.full(n_obs, -1, dtype=np.int64)
+    obs_pair[active] = pair_idx
+    groups = (_group_matrix(cam_idx, n_cameras), _group_matrix(point_indices, n_points),
+              _group_matrix(pair_idx, len(pair_key)))
+    pair_cam_group = _group_matrix(pair_cam, n_cameras)
+    pair_point_group = _group_matrix(pair_pt, n_points)
+    point_ptr = np.searchsorted(pair_pt, np.arange(n_points + 1))
+
+    x = params.copy()
+    r = bundle_adjustment_residuals(x, *args)
+    cost, weights = _loss_weights(r, loss, f_scale)
+    nfev = 1
+    lam = 1e-4
+    message = "The maximum number of function evaluations is exceeded."
+
+    while nfev < max_iterations:
+        # IRLS-weighted normal-equation blocks
+        J = _jacobian_blocks(x, n_cameras, n_points, camera_indices, point_indices, K,
+                             fixed_camera_params)
+        U, V, W, gc, gp = _normal_blocks(J, np.sqrt(weights).reshape(n_obs, 2), r.reshape(n_obs, 2),
+                                         camera_indices, point_indices, obs_pair, groups,
+                                         n_cameras, n_points)
+
+        accepted = False
+        while nfev < max_iterations:
+            V_inv = np.linalg.inv(_damp(V, lam))
+            Y = W @ V_inv[pair_pt]  # blocks of W V^-1
+
+            # Reduced camera system (U - W V^-1 W^T) dc = -gc + W V^-1 gp
+            S = _schur_complement(Y, W, pair_cam, pair_pt, point_ptr, n_cameras, n_points)
+            U_d = _damp(U, lam)
+            for c in range(n_cameras):
+                S[6 * c:6 * c + 6, 6 * c:6 * c + 6] += U_d[c]
+            rhs = -gc + _block_sum(pair_cam_group, Y @ gp[pair_pt, :, None]).ravel()
+            try:
+                dc = np.linalg.solve(S, rhs)
+            except np.linalg.LinAlgError:
+                lam *= 10
+                continue
+            # Back-substitution dp = V^-1 (-gp - W^T dc)
+            Wt_dc = _block_sum(pair_point_group,
+                               W.transpose(0, 2, 1) @ dc.reshape(n_cameras, 6, 1)[pair_cam])
+            dp = (V_inv @ (-gp[:, :, None] - Wt_dc)).ravel()
+            dx = np.concatenate([dc, dp])
+
+            x_new = x + dx
+            r_new = bundle_adjustment_residuals(x_new, *args)
+            cost_new, weights_new = _loss_weights(r_new, loss, f_scale)
+            nfev += 1
+            if np.isfinite(cost_new) and cost_new < cost:
+                accepted = True
+                break
+            lam *= 10
+        if not accepted:
+            break
+
+        reduction = cost - cost_new
+        x, r, weights, cost = x_new, r_new, weights_new, cost_new
+        lam = max(lam / 10, 1e-12)
+        if verbose:
+            print(f"  LM evaluation {nfev}: cost {cost:.6e}, lambda {lam:.1e}")
+        if reduction < ftol * (cost + reduction):
+            message = "`ftol` termination condition is satisfied."
+            break
+        if np.linalg.norm(dx) < xtol * (xtol + np.linalg.norm(x)):
+            message = "`xtol` termination condition is satisfied."
+            break
+
+    return x, r, nfev, message
 
-        # Convert rotation vector to matrix
-        R, _ = cv2.Rodrigues(rvec)
-        t = tvec.reshape(3, 1)
-
-        # Project point
-        point_3d = points_3d[pt_idx]
-        projected = project_points(point_3d.reshape(1, 3), K, R, t)[0]
-
-        # Compute residual
-        residual = observed - projected
-        residuals.append(residual)
-
-    return np.concatenate(residuals)
-
-
-# def run_bundle_adjustment(mapper: IncrementalMapper, max_iterations: int = 50, verbose: bool = False) -> tuple[float, float]:
-#     """
-#     Run bundle adjustment to refine cameras and 3D points.
-
-#     Args:
-#         mapper: IncrementalMapper object with cameras and tracks
-#         max_iterations: Maximum optimization iterations (default: 50)
-#         verbose: If True, print optimization progress (default: False)
-
-#     Returns:
-#         Tuple of (initial_rmse, final_rmse)
-#     """
-#     # Get observation data
-#     camera_indices, point_indices, points_2d, camera_id_map, track_id_map = mapper.build_observation_matrices()
-
-#     if len(camera_indices) == 0:
-#         print("Warning: No observations found for bundle adjustment")
-#         return 0.0, 0.0
-
-#     n_cameras = len(mapper.cameras)
-#     n_points = len(mapper.tracks)
-#     n_observations = len(camera_indices)
-
-#     if verbose:
-#         print(f"Bundle Adjustment setup:")
-#         print(f"  Cameras: {n_cameras}")
-#         print(f"  3D Points: {n_points}")
-#         print(f"  Observations: {n_observations}")
-#         print(f"  Parameters: {n_cameras * 6 + n_points * 3}")
-
-#     # Build initial parameter vector
-#     camera_list = sorted(mapper.cameras.keys())
-#     track_list = sorted(mapper.tracks.keys())
-
-#     camera_params = []
-#     for cam_id in camera_list:
-#         cam = mapper.cameras[cam_id]
-#         rvec, _ = cv2.Rodrigues(cam.R)
-#         camera_params.extend(rvec.ravel())
-#         camera_params.extend(cam.t.ravel())
-
-#     point_params = []
-#     for track_id in track_list:
-#         track = mapper.tracks[track_id]
-#         point_params.extend(track.coord)
-
-#     params = np.array(camera_params + point_params, dtype=np.float64)
-
-#     # Compute initial RMSE
-#     residuals_init = bundle_adjustment_residuals(
-#         params, n_cameras, n_points,
-#         camera_indices, point_indices, points_2d, mapper.K
-#     )
-#     initial_rmse = np.sqrt(np.mean(residuals_init ** 2))
-
-#     if verbose:
-#         print(f"  Initial RMSE: {initial_rmse:.3f} pixels")
-
-#     # Run optimization with better termination criteria
-#     result = least_squares(
-#         bundle_adjustment_residuals,
-#         params,
-#         args=(n_cameras, n_points, camera_indices, point_indices, points_2d, mapper.K),
-#         max_nfev=max_iterations,
-#         ftol=1e-4,  # More lenient tolerance for faster convergence
-#         xtol=1e-4,  # More lenient parameter tolerance
-#         verbose=2 if verbose else 0,  # Show progress if verbose
-#         method='trf'  # Trust Region Reflective algorithm
-#     )
-
-#     if verbose:
-#         print(f"  Optimization status: {result.status}")
-#         print(f"  Iterations: {result.nfev}")
-#         print(f"  Success: {result.success}")
-
-#     # Extract refined parameters
-#     refined_params = result.x
-#     camera_params_refined = refined_params[:n_cameras * 6].reshape((n_cameras, 6))
-#     points_refined = refined_params[n_cameras * 6:].reshape((n_points, 3))
-
-#     # Update mapper with refined values
-#     for i, cam_id in enumerate(camera_list):
-#         rvec = camera_params_refined[i, :3]
-#         tvec = camera_params_refined[i, 3:6]
-#         R, _ = cv2.Rodrigues(rvec)
-#         mapper.cameras[cam_id].R = R
-#         mapper.cameras[cam_id].t = tvec
-
-#     for i, track_id in enumerate(track_list):
-#         mapper.tracks[track_id].coord = points_refined[i]
-
-#     # Compute final RMSE
-#     final_rmse = np.sqrt(np.mean(result.fun ** 2))
-
-#     if verbose:
-#         print(f"  Final RMSE: {final_rmse:.3f} pixels")
-
-#     return initial_rmse, final_rmse
 
 def run_bundle_adjustment(
     mapper: IncrementalMapper,
@@ -193,6 +592,10 @@ def run_bundle_adjustment(
     quick_tolerances: bool = False,
     downsample_observations: float | int | None = None,
     random_state: int = 0,
+    window_size: int | None = None,
+    loss: str = 'linear',
+    f_scale: float = 1.5,
+    solver: str = 'auto',
 ) -> tuple[float, float]:
     # Get observation data
     camera_indices, point_indices, points_2d, camera_id_map, track_id_map = mapper.build_observation_matrices()
@@ -208,6 +611,40 @@ def run_bundle_adjustment(
     n_points = len(track_list)
     n_observations = len(camera_indices)
 
+    # Sliding window: only the most recent window_size cameras and the points
+    # they observe are optimized; older cameras observing those points stay
+    # constant and are passed to the residual as fixed_camera_params
+    fixed_camera_params = None
+    if window_size is not None and 0 < window_size < n_cameras:
+        n_active = window_size
+        active_pts = np.unique(point_indices[camera_indices >= n_cameras - n_active])
+        obs_mask = np.isin(point_indices, active_pts)
+        camera_indices = camera_indices[obs_mask]
+        point_indices = np.searchsorted(active_pts, point_indices[obs_mask])
+        points_2d = points_2d[obs_mask]
+
+        # Active cameras become 0..n_active-1, constant ones follow them
+        fixed_cams = np.unique(camera_indices[camera_indices < n_cameras - n_active])
+        cam_order = np.concatenate([np.arange(n_cameras - n_active, n_cameras), fixed_cams])
+        remap = np.empty(n_cameras, dtype=np.int64)
+        remap[cam_order] = np.arange(len(cam_order))
+        camera_indices = remap[camera_indices]
+
+        fixed_camera_params = np.empty((len(fixed_cams), 6))
+        for i, cam_idx in enumerate(fixed_cams):
+            cam = mapper.cameras[camera_list[cam_idx]]
+            fixed_camera_params[i, :3] = cv2.Rodrigues(cam.R)[0].ravel()
+            fixed_camera_params[i, 3:6] = cam.t.ravel()
+
+        camera_list = camera_list[-n_active:]
+        track_list = [track_list[i] for i in active_pts]
+        n_cameras = n_active
+        n_points = len(track_list)
+        n_observations = len(camera_indices)
+
+        if verbose:
+            print(f"Window: optimizing {n_cameras} cameras, {len(fixed_cams)} held constant")
+
     if downsample_observations is not None:
         obs_count = n_observations
         if isinstance(downsample_observations, float) and downsample_observations < 1.0:
@@ -223,8 +660,7 @@ def run_bundle_adjustment(
 
             # Re-index points to a compact set and filter track list
             unique_pts = np.unique(point_indices)
-            old_to_new = {old: new for new, old in enumerate(unique_pts)}
-            point_indices = np.array([old_to_new[i] for i in point_indices], dtype=int)
+            point_indices = np.searchsorted(unique_pts, point_indices).astype(np.int64)
             track_list = [track_list[i] for i in unique_pts]
             n_points = len(track_list)
             n_observations = keep
@@ -239,25 +675,22 @@ def run_bundle_adjustment(
         print(f"  Observations: {n_observations}")
         print(f"  Parameters: {n_cameras * 6 + n_points * 3}")
 
-    # Build initial parameter vector
-    camera_params = []
-    for cam_id in camera_list:
+    # Build initial parameter vector, filling views of one preallocated array
+    params = np.empty(n_cameras * 6 + n_points * 3, dtype=np.float64)
+    camera_params = params[:n_cameras * 6].reshape((n_cameras, 6))
+    for i, cam_id in enumerate(camera_list):
         cam = mapper.cameras[cam_id]
-        rvec, _ = cv2.Rodrigues(cam.R)
-        camera_params.extend(rvec.ravel())
-        camera_params.extend(cam.t.ravel())
-
-    point_params = []
-    for track_id in track_list:
-        track = mapper.tracks[track_id]
-        point_params.extend(track.coord)
+        camera_params[i, :3] = cv2.Rodrigues(cam.R)[0].ravel()
+        camera_params[i, 3:6] = cam.t.ravel()
 
-    params = np.array(camera_params + point_params, dtype=np.float64)
+    point_params = params[n_cameras * 6:].reshape((n_points, 3))
+    for i, track_id in enumerate(track_list):
+        point_params[i] = mapper.tracks[track_id].coord
 
     # Initial RMSE
     residuals_init = bundle_adjustment_residuals(
         params, n_cameras, n_points,
-        camera_indices, point_indices, points_2d, mapper.K
+        camera_indices, point_indices, points_2d, mapper.K, fixed_camera_params
     )
     initial_rmse = np.sqrt(np.mean(residuals_init ** 2))
 
@@ -268,23 +701,23 @@ def run_bundle_adjustment(
     ftol = 1e-2 if quick_tolerances else 1e-4
     xtol = 1e-2 if quick_tolerances else 1e-4
 
-    result = least_squares(
-        bundle_adjustment_residuals,
-        params,
-        args=(n_cameras, n_points, camera_indices, point_indices, points_2d, mapper.K),
-        max_nfev=max_iterations,
-        ftol=ftol,
-        xtol=xtol,
-        verbose=2 if verbose else 0,
-        method='trf'
-    )
-
-    if verbose:
-        print(f"  Optimization status: {result.status}")
-        print(f"  Iterations: {result.nfev}")
-        print(f"  Success: {result.success}")
+    # 'schur': LM on the reduced camera system; 'scipy': least_squares TRF.
+    # Two-view problems are tiny, so 'auto' keeps them on the scipy path
+    if solver == 'auto':
+        solver = 'schur' if n_cameras > 2 else 'scipy'
+    solver_args = (params, n_cameras, n_points, camera_indices, point_indices, points_2d,
+                   mapper.K, fixed_camera_params, max_iterations, ftol, xtol, loss, f_scale,
+                   verbose)
+    if solver == 'schur':
+        refined_params, final_residuals, nfev, message = _solve_schur_lm(*solver_args)
+        if verbose:
+            print(f"  Optimization status: {message}")
+            print(f"  Iterations: {nfev}")
+    elif solver == 'scipy':
+        refined_params, final_residuals = _solve_scipy(*solver_args)
+    else:
+        raise ValueError(f"Unknown bundle adjustment solver: {solver}")
 
-    refined_params = result.x
     camera_params_refined = refined_params[:n_cameras * 6].reshape((n_cameras, 6))
     points_refined = refined_params[n_cameras * 6:].reshape((n_points, 3))
 
@@ -299,9 +732,54 @@ def run_bundle_adjustment(
     for i, track_id in enumerate(track_list):
         mapper.tracks[track_id].coord = points_refined[i]
 
-    final_rmse = np.sqrt(np.mean(result.fun ** 2))
+    final_rmse = np.sqrt(np.mean(final_residuals ** 2))
 
     if verbose:
         print(f"  Final RMSE: {final_rmse:.3f} pixels")
 
     return initial_rmse, final_rmse
+
+
+def _solve_scipy(params: np.ndarray,
+                 n_cameras: int,
+                 n_points: int,
+                 camera_indices: np.ndarray,
+                 point_indices: np.ndarray,
+                 points_2d: np.ndarray,
+                 K: np.ndarray,
+                 fixed_camera_params: np.ndarray | None,
+                 max_iterations: int,
+                 ftol: float,
+                 xtol: float,
+                 loss: str,
+                 f_scale: float,
+                 verbose: bool) -> tuple[np.ndarray, np.ndarray]:
+    """least_squares TRF with the analytic sparse Jacobian; returns (x, residuals)."""
+    result = least_squares(
+        bundle_adjustment_residuals,
+        params,
+        jac=bundle_adjustment_jacobian,
+        args=(n_cameras, n_points, camera_indices, point_indices, points_2d, K,
+              fixed_camera_params),
+        max_nfev=max_iterations,
+        ftol=ftol,
+        xtol=xtol,
+        verbose=2 if verbose else 0,
+        method='trf',
+        # Iterative sparse trust-region solves; each step never forms J^T J densely
+        tr_solver='lsmr',
+        tr_options={'atol': 1e-3, 'btol': 1e-3, 'maxiter': 200},
+        x_scale='jac',
+        # Plain L2 by default: with SciPy's TRF, 'huber'/'cauchy' take tiny steps
+        # and stop on xtol near the initial estimate. Pass loss='soft_l1' or
+        # 'huber' (with f_scale in pixels) when outlier observations dominate
+        loss=loss,
+        f_scale=f_scale,
+    )
+
+    if verbose:
+        print(f"  Optimization status: {result.status}")
+        print(f"  Iterations: {result.nfev}")
+        print(f"  Success: {result.success}")
+
+    return result.x, result.fun
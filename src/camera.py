@@ -1,5 +1,8 @@
 """Camera intrinsic matrix construction and utilities."""
 
+from typing import Optional, Tuple
+
+import cv2
 import numpy as np
 
 
@@ -25,3 +28,103 @@ def build_intrinsic_matrix(image_width: int, image_height: int) -> np.ndarray:
     ], dtype=np.float64)
 
     return K
+
+
+def downscale_to_max_dimension(
+    image: np.ndarray, max_dimension: Optional[int]
+) -> Tuple[np.ndarray, float]:
+    """
+    Shrink an image so its longer edge is at most max_dimension pixels.
+
+    Build K from the returned image's size (or scale fx, fy, cx, cy by the
+    returned factor) so geometry stays consistent with the detected keypoints.
+
+    Args:
+        image: Input image
+        max_dimension: Longest allowed edge in pixels; None disables resizing
+
+    Returns:
+        Tuple of (image, scale); the input is returned unchanged with scale 1.0
+        when it already fits
+    """
+    h, w = image.shape[:2]
+    if max_dimension is None or max(h, w) <= max_dimension:
+        return image, 1.0
+    scale = max_dimension / max(h, w)
+    resized = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return resized, scale
+
+
+# imread flags that let libjpeg decode straight to 1/2, 1/4 or 1/8 size
+_REDUCED_COLOR_FLAGS = {
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+def _jpeg_size(path: str) -> Optional[Tuple[int, int]]:
+    """(width, height) from a JPEG's SOF header without decoding; None if not a JPEG."""
+    try:
+        with open(path, "rb") as f:
+            if f.read(2) != b"\xff\xd8":
+                return None
+            while True:
+                byte = f.read(1)
+                while byte and byte != b"\xff":
+                    byte = f.read(1)
+                while byte == b"\xff":  # fill bytes
+                    byte = f.read(1)
+                if not byte:
+                    return None
+                marker = byte[0]
+                if marker == 0x01 or 0xD0 <= marker <= 0xD9:  # markers without a length
+                    continue
+                length_bytes = f.read(2)
+                if len(length_bytes) < 2:  # truncated file
+                    return None
+                length = int.from_bytes(length_bytes, "big")
+                if length < 2:  # malformed segment; seeking by length - 2 would loop
+                    return None
+                if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                    header = f.read(5)  # precision, height, width
+                    if len(header) < 5:
+                        return None
+                    return int.from_bytes(header[3:5], "big"), int.from_bytes(header[1:3], "big")
+                f.seek(length - 2, 1)
+    except OSError:
+        return None
+
+
+def read_image(
+    path: str, max_dimension: Optional[int] = None, fast_decode: bool = True
+) -> Tuple[Optional[np.ndarray], float]:
+    """
+    Read a color image with its longer edge capped at max_dimension pixels.
+
+    With fast_decode, JPEGs are decoded directly at the largest 1/2, 1/4 or
+    1/8 reduction that keeps the longer edge at or above max_dimension (libjpeg
+    DCT scaling), so the full-resolution buffer is never allocated; the
+    remainder is resized with INTER_AREA as in downscale_to_max_dimension.
+
+    Args:
+        path: Image file
+        max_dimension: Longest allowed edge in pixels; None reads full resolution
+        fast_decode: Use reduced decoding; False decodes fully, then resizes
+
+    Returns:
+        Tuple of (image, scale relative to the file's resolution); image is
+        None if the file cannot be read
+    """
+    factor = 1
+    size = _jpeg_size(path) if max_dimension is not None and fast_decode else None
+    if size is not None:
+        for f in (8, 4, 2):
+            if max(size) / f >= max_dimension:
+                factor = f
+                break
+    image = cv2.imread(path, _REDUCED_COLOR_FLAGS[factor]) if factor > 1 else cv2.imread(path)
+    if image is None:
+        return None, 1.0
+    image, scale = downscale_to_max_dimension(image, max_dimension)
+    return image, scale / factor
@@ -2,20 +2,24 @@
 
 from __future__ import annotations
 
-import json
+from itertools import chain
 from pathlib import Path
-from shutil import copy2
 from typing import Dict, List, Tuple
 
 import numpy as np
+from scipy.sparse import csr_matrix, triu
 from scipy.spatial.transform import Rotation
 
+from .utils import FLIP_SIGNS, copy_files, save_point_cloud_ply_binary, top_k_by_count, write_json
+
 
 # Defaults can be adjusted at runtime if importing this module
 INPUT_DIR = Path("calibration")
 IMAGE_DIR = Path("Data/boulders")
 OUTPUT_DIR = Path("viewer/assets")
 
+FLIP_CONJ_SIGNS = np.outer(FLIP_SIGNS, FLIP_SIGNS)  # flip @ R @ flip == R * FLIP_CONJ_SIGNS
+
 
 def qvec_to_rotmat(qvec: np.ndarray) -> np.ndarray:
     """Convert COLMAP quaternion [qw, qx, qy, qz] to rotation matrix."""
@@ -55,62 +59,47 @@ def parse_images_txt(path: Path) -> Dict[int, dict]:
 
 
 def parse_points3d_txt(path: Path) -> Tuple[np.ndarray, np.ndarray, Dict[int, List[int]]]:
-    points = []
-    colors = []
+    # Split off the 8 fixed columns (ID, X, Y, Z, R, G, B, ERROR) and convert
+    # them in bulk; only the variable-length track tail is handled per line
+    rows = [line.split(None, 8) for line in path.read_text().splitlines() if line and not line.startswith("#")]
+    rows = [row for row in rows if len(row) >= 8]
+    if not rows:
+        return np.empty((0, 3), dtype=float), np.empty((0, 3), dtype=int), {}
+    fixed = np.array([row[:8] for row in rows])
+    points = fixed[:, 1:4].astype(float)
+    colors = fixed[:, 4:7].astype(int)
     tracks: Dict[int, List[int]] = {}
-    for line in path.read_text().splitlines():
-        if not line or line.startswith("#"):
-            continue
-        parts = line.split()
-        if len(parts) < 8:
+    for pt_idx, row in enumerate(rows):
+        if len(row) < 9:
             continue
-        X, Y, Z = map(float, parts[1:4])
-        R_, G_, B_ = map(int, parts[4:7])
-        points.append([X, Y, Z])
-        colors.append([R_, G_, B_])
-        track = parts[8:]
-        seen_by = [int(track[k]) for k in range(0, len(track), 2)]
-        for m in range(len(seen_by)):
-            for n in range(m + 1, len(seen_by)):
-                a, b = seen_by[m], seen_by[n]
-                tracks.setdefault(a, []).append(len(points) - 1)
-                tracks.setdefault(b, []).append(len(points) - 1)
-    return np.array(points, dtype=float), np.array(colors, dtype=int), tracks
+        # track: pairs of (image_id, point2d_idx); only the image ids are needed
+        for img_id in row[8].split()[::2]:
+            tracks.setdefault(int(img_id), []).append(pt_idx)
+    return points, colors, tracks
 
 
 def compute_covisibility(tracks: Dict[int, List[int]], min_shared: int = 20, top_k: int = 5) -> Dict[int, List[int]]:
-    counts: Dict[Tuple[int, int], int] = {}
-    for cam_id, pts in tracks.items():
-        set_pts = set(pts)
-        for other_id, other_pts in tracks.items():
-            if other_id <= cam_id:
-                continue
-            shared = len(set_pts.intersection(other_pts))
-            if shared >= min_shared:
-                counts[(cam_id, other_id)] = shared
+    # Shared-point counts are the off-diagonal entries of A @ A.T, where A is
+    # the cameras x points incidence matrix
+    cam_ids = sorted(tracks)
+    rows = np.repeat(np.arange(len(cam_ids)), [len(tracks[c]) for c in cam_ids])
+    cols = np.fromiter(chain.from_iterable(tracks[c] for c in cam_ids), dtype=np.int64, count=len(rows))
+    n_pts = int(cols.max()) + 1 if len(cols) else 0
+    A = csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, cols)), shape=(len(cam_ids), n_pts))
+    A.data[:] = 1  # repeated (camera, point) entries were summed; count each point once
+    C = triu(A @ A.T, k=1).tocoo()
+    keep = C.data >= min_shared
     neighbors: Dict[int, List[int]] = {}
-    for (a, b), cnt in counts.items():
-        neighbors.setdefault(a, []).append((b, cnt))
-        neighbors.setdefault(b, []).append((a, cnt))
+    for i, j, cnt in zip(C.row[keep], C.col[keep], C.data[keep]):
+        a, b = cam_ids[i], cam_ids[j]
+        neighbors.setdefault(a, []).append((b, int(cnt)))
+        neighbors.setdefault(b, []).append((a, int(cnt)))
     pruned = {}
     for cam_id, adj in neighbors.items():
-        adj_sorted = sorted(adj, key=lambda x: x[1], reverse=True)
-        pruned[cam_id] = [nid for nid, _ in adj_sorted[:top_k]]
+        pruned[cam_id] = top_k_by_count(adj, top_k)
     return pruned
 
 
-def save_ply(points: np.ndarray, colors: np.ndarray, path: Path):
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "w") as f:
-        f.write("ply\nformat ascii 1.0\n")
-        f.write(f"element vertex {len(points)}\n")
-        f.write("property float x\nproperty float y\nproperty float z\n")
-        f.write("property uchar red\nproperty uchar green\nproperty uchar blue\n")
-        f.write("end_header\n")
-        for p, c in zip(points, colors):
-            f.write(f"{p[0]:.6f} {p[1]:.6f} {p[2]:.6f} {int(c[0])} {int(c[1])} {int(c[2])}\n")
-
-
 def convert_colmap(
     input_dir: Path = INPUT_DIR,
     image_dir: Path = IMAGE_DIR,
@@ -126,31 +115,34 @@ def convert_colmap(
     points, colors, tracks = parse_points3d_txt(points_txt)
     covis = compute_covisibility(tracks, min_shared=min_shared, top_k=top_k)
 
-    flip = np.diag([1, -1, -1])
-
     output_dir.mkdir(parents=True, exist_ok=True)
     (output_dir / "images").mkdir(parents=True, exist_ok=True)
 
     # Flip point cloud to Three.js coords (y up, z back)
-    points_flipped = (points @ flip.T)
+    points_flipped = points * FLIP_SIGNS
     ply_path = output_dir / "model.ply"
-    save_ply(points_flipped, colors, ply_path)
+    save_point_cloud_ply_binary(points_flipped, colors, str(ply_path))
 
     sorted_ids = sorted(images_data.keys())
     id_map = {old_id: idx for idx, old_id in enumerate(sorted_ids)}
 
+    # Convert all poses to Three.js coords in one batch
+    centers_cv = np.array([images_data[i]["center"] for i in sorted_ids]).reshape(-1, 3)
+    R_wc = np.array([images_data[i]["R_wc"] for i in sorted_ids]).reshape(-1, 3, 3)
+    centers_three = centers_cv * FLIP_SIGNS
+    quats = Rotation.from_matrix(R_wc * FLIP_CONJ_SIGNS).as_quat()
+
     cameras_export = []
-    for old_id in sorted_ids:
+    copies: List[Tuple[Path, Path]] = []
+    for i, old_id in enumerate(sorted_ids):
         entry = images_data[old_id]
-        C_cv = entry["center"]
-        C_three = flip @ C_cv
-        R_three = flip @ entry["R_wc"] @ flip
-        quat = Rotation.from_matrix(R_three).as_quat()
+        C_three = centers_three[i]
+        quat = quats[i]
 
         img_name = entry["name"]
         src_img = image_dir / img_name
         if src_img.exists():
-            copy2(src_img, output_dir / "images" / src_img.name)
+            copies.append((src_img, output_dir / "images" / src_img.name))
 
         neighbors = [id_map[nid] for nid in covis.get(old_id, []) if nid in id_map]
 
@@ -158,19 +150,20 @@ def convert_colmap(
             {
                 "id": id_map[old_id],
                 "filename": img_name,
-                "position": C_three.astype(float).tolist(),
-                "quaternion": quat.astype(float).tolist(),
+                "position": C_three.tolist(),
+                "quaternion": quat.tolist(),
                 "neighbors": neighbors,
             }
         )
 
+    copy_files(copies)
+
     payload = {
         "cameras": cameras_export,
         "point_cloud_path": "assets/model.ply",
     }
     out_json = output_dir / "data.json"
-    with open(out_json, "w", encoding="utf-8") as f:
-        json.dump(payload, f, indent=2)
+    write_json(payload, out_json)
     return out_json
 
 
@@ -2,15 +2,17 @@
 
 from __future__ import annotations
 
-import json
 from dataclasses import asdict, dataclass
+from itertools import chain
 from pathlib import Path
-from shutil import copy2
 from typing import Dict, List, Tuple
 
 import numpy as np
+from scipy.sparse import csr_matrix, triu
 from scipy.spatial.transform import Rotation
 
+from .utils import FLIP_SIGNS, copy_files, save_point_cloud_ply_binary, top_k_by_count, write_json
+
 
 @dataclass
 class CameraExport:
@@ -56,70 +58,51 @@ def parse_images_txt(path: Path) -> Dict[int, dict]:
 
 
 def parse_points3d_txt(path: Path) -> Tuple[np.ndarray, np.ndarray, Dict[int, List[int]]]:
-    points = []
-    colors = []
+    # Split off the 8 fixed columns (ID, X, Y, Z, R, G, B, ERROR) and convert
+    # them in bulk; only the variable-length track tail is handled per line
+    rows = [line.split(None, 8) for line in path.read_text().splitlines() if line and not line.startswith("#")]
+    rows = [row for row in rows if len(row) >= 8]
+    if not rows:
+        return np.empty((0, 3), dtype=float), np.empty((0, 3), dtype=int), {}
+    fixed = np.array([row[:8] for row in rows])
+    points = fixed[:, 1:4].astype(float)
+    colors = fixed[:, 4:7].astype(int)
     tracks: Dict[int, List[int]] = {}
-    lines = path.read_text().splitlines()
-    for line in lines:
-        if not line or line.startswith("#"):
-            continue
-        tokens = line.split()
-        if len(tokens) < 8:
+    for pt_idx, row in enumerate(rows):
+        if len(row) < 9:
             continue
-        X, Y, Z = map(float, tokens[1:4])
-        R, G, B = map(int, tokens[4:7])
-        points.append([X, Y, Z])
-        colors.append([R, G, B])
-        # track: remaining tokens after error term; pairs of (image_id, point2d_idx)
-        track_tokens = tokens[8:]
-        for i in range(0, len(track_tokens), 2):
+        # track: pairs of (image_id, point2d_idx); only the image ids are needed
+        for token in row[8].split()[::2]:
             try:
-                img_id = int(track_tokens[i])
+                img_id = int(token)
             except ValueError:
                 continue
-            tracks.setdefault(img_id, []).append(len(points) - 1)
-    return np.array(points, dtype=float), np.array(colors, dtype=int), tracks
+            tracks.setdefault(img_id, []).append(pt_idx)
+    return points, colors, tracks
 
 
 def compute_covisibility(tracks: Dict[int, List[int]], min_shared: int = 20, top_k: int = 5) -> Dict[int, List[int]]:
-    counts: Dict[Tuple[int, int], int] = {}
-    for cams, _ in tracks.items():
-        pass  # placeholder for type hints
-    for cam_id, pts in tracks.items():
-        pts_set = set(pts)
-        for other_id, other_pts in tracks.items():
-            if other_id <= cam_id:
-                continue
-            shared = len(pts_set.intersection(other_pts))
-            if shared >= min_shared:
-                key = (cam_id, other_id)
-                counts[key] = shared
+    # Shared-point counts are the off-diagonal entries of A @ A.T, where A is
+    # the cameras x points incidence matrix
+    cam_ids = sorted(tracks)
+    rows = np.repeat(np.arange(len(cam_ids)), [len(tracks[c]) for c in cam_ids])
+    cols = np.fromiter(chain.from_iterable(tracks[c] for c in cam_ids), dtype=np.int64, count=len(rows))
+    n_pts = int(cols.max()) + 1 if len(cols) else 0
+    A = csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, cols)), shape=(len(cam_ids), n_pts))
+    A.data[:] = 1  # repeated (camera, point) entries were summed; count each point once
+    C = triu(A @ A.T, k=1).tocoo()
+    keep = C.data >= min_shared
     neighbors: Dict[int, List[int]] = {}
-    all_cam_ids = set([cid for pair in counts for cid in pair])
-    for cam_id in all_cam_ids:
-        neighbors[cam_id] = []
-    for (a, b), cnt in counts.items():
-        neighbors.setdefault(a, []).append((b, cnt))
-        neighbors.setdefault(b, []).append((a, cnt))
+    for i, j, cnt in zip(C.row[keep], C.col[keep], C.data[keep]):
+        a, b = cam_ids[i], cam_ids[j]
+        neighbors.setdefault(a, []).append((b, int(cnt)))
+        neighbors.setdefault(b, []).append((a, int(cnt)))
     pruned = {}
     for cam_id, adj in neighbors.items():
-        adj_sorted = sorted(adj, key=lambda x: x[1], reverse=True)
-        pruned[cam_id] = [nid for nid, _ in adj_sorted[:top_k]]
+        pruned[cam_id] = top_k_by_count(adj, top_k)
     return pruned
 
 
-def save_ply(points: np.ndarray, colors: np.ndarray, path: Path):
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "w") as f:
-        f.write("ply\nformat ascii 1.0\n")
-        f.write(f"element vertex {len(points)}\n")
-        f.write("property float x\nproperty float y\nproperty float z\n")
-        f.write("property uchar red\nproperty uchar green\nproperty uchar blue\n")
-        f.write("end_header\n")
-        for p, c in zip(points, colors):
-            f.write(f"{p[0]:.6f} {p[1]:.6f} {p[2]:.6f} {int(c[0])} {int(c[1])} {int(c[2])}\n")
-
-
 def export_from_colmap(
     images_dir: str,
     cameras_txt: str,
@@ -148,41 +131,46 @@ def export_from_colmap(
     # Covisibility
     covis = compute_covisibility(tracks, min_shared=min_shared, top_k=top_k)
 
-    flip = np.diag([1, -1, -1])
+    # Convert all poses to Three.js coords in one batch
+    entries = list(images_data.values())
+    R_wc = np.array([qvec_to_rotmat(e["qvec"]) for e in entries]).reshape(-1, 3, 3)
+    tvecs = np.array([e["tvec"] for e in entries]).reshape(-1, 3)
+    C_cv = -np.einsum("nji,nj->ni", R_wc, tvecs)
+    centers_three = C_cv * FLIP_SIGNS
+    # flip @ R_wc^T negates rows 1 and 2 of the world rotation
+    quats = Rotation.from_matrix(R_wc.transpose(0, 2, 1) * FLIP_SIGNS[:, None]).as_quat()
+
     cameras_export: List[CameraExport] = []
-    for img_id, entry in images_data.items():
-        qvec = entry["qvec"]
-        tvec = entry["tvec"]
-        R_wc = qvec_to_rotmat(qvec)
-        C_cv = -R_wc.T @ tvec.reshape(3)
-        C_three = flip @ C_cv
-        R_three_world = flip @ R_wc.T
-        quat = Rotation.from_matrix(R_three_world).as_quat()
+    copies: List[Tuple[Path, Path]] = []
+    for i, (img_id, entry) in enumerate(images_data.items()):
+        C_three = centers_three[i]
+        quat = quats[i]
 
         img_name = entry["name"]
         src_img = images_dir / img_name
         if src_img.exists():
-            copy2(src_img, images_out / src_img.name)
+            copies.append((src_img, images_out / src_img.name))
 
         cameras_export.append(
             CameraExport(
                 id=img_id,
                 filename=img_name,
-                position=C_three.astype(float).tolist(),
-                quaternion=quat.astype(float).tolist(),
+                position=C_three.tolist(),
+                quaternion=quat.tolist(),
                 neighbors=covis.get(img_id, []),
             )
         )
 
     # Save PLY (points in COLMAP coords; viewer flips via pointCloud rotation)
     ply_out = out_root / "model.ply"
-    save_ply(points, colors, ply_out)
+    save_point_cloud_ply_binary(points, colors, str(ply_out))
+
+    copy_files(copies)
 
     payload = {
         "cameras": [asdict(c) for c in cameras_export],
         "point_cloud_path": "assets/model.ply",
     }
     out_json = out_root / "data.json"
-    with open(out_json, "w", encoding="utf-8") as f:
-        json.dump(payload, f, indent=2)
+    write_json(payload, out_json)
     return out_json
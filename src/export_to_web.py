@@ -2,15 +2,17 @@
 
 from __future__ import annotations
 
-import json
+import shutil
 from dataclasses import asdict, dataclass
 from pathlib import Path
-from shutil import copy2
 from typing import Dict, List, Optional, Tuple
 
 import numpy as np
+from scipy.sparse import csr_matrix, triu
 from scipy.spatial.transform import Rotation
 
+from .utils import FLIP_SIGNS, copy_files, top_k_by_count, write_json
+
 
 @dataclass
 class CameraExport:
@@ -22,50 +24,56 @@ class CameraExport:
 
 
 def _camera_center(R_wc: np.ndarray, t: np.ndarray) -> np.ndarray:
-    """Compute camera center C = -R^T t from world-to-camera pose."""
-    return -R_wc.T @ t.reshape(3)
+    """Compute camera centers C = -R^T t from world-to-camera poses (Nx3x3, Nx3)."""
+    return -np.einsum("nji,nj->ni", R_wc, t.reshape(-1, 3))
 
 
 def _flip_cv_to_three(vec: np.ndarray) -> np.ndarray:
-    """Flip Y/Z axes to go from OpenCV (y down, z forward) to Three.js (y up, z back)."""
-    flip = np.diag([1, -1, -1])
-    return flip @ vec
+    """Flip Y/Z axes of Nx3 vectors to go from OpenCV (y down, z forward) to Three.js (y up, z back)."""
+    return vec * FLIP_SIGNS
 
 
 def _rot_cv_to_three_world(R_wc: np.ndarray) -> np.ndarray:
     """
-    Convert OpenCV world-to-camera rotation to Three.js world rotation matrix.
+    Convert OpenCV world-to-camera rotations (Nx3x3) to Three.js world rotation matrices.
 
     R_wc maps world -> camera. The camera object in Three.js uses the inverse
     (world) rotation. We also flip Y/Z to match coordinate conventions.
     """
-    flip = np.diag([1, -1, -1])
-    R_world = R_wc.T  # camera orientation in world coords
-    return flip @ R_world
+    R_world = R_wc.transpose(0, 2, 1)  # camera orientation in world coords
+    return R_world * FLIP_SIGNS[:, None]  # flip @ R_world, i.e. negate rows 1 and 2
 
 
 def _compute_covisibility(mapper, min_shared: int = 30, top_k: int = 5) -> Dict[int, List[int]]:
     """Build covisibility graph: connect cameras sharing at least min_shared points."""
-    counts: Dict[Tuple[int, int], int] = {}
-    for track in mapper.tracks.values():
-        cams = sorted(track.observations.keys())
-        for i in range(len(cams)):
-            for j in range(i + 1, len(cams)):
-                a, b = cams[i], cams[j]
-                key = (a, b) if a < b else (b, a)
-                counts[key] = counts.get(key, 0) + 1
+    # Shared-point counts are the off-diagonal entries of A @ A.T, where A is
+    # the cameras x tracks incidence matrix
+    cam_ids = sorted(mapper.cameras)
+    cam_to_row = {cam_id: i for i, cam_id in enumerate(cam_ids)}
+    rows: List[int] = []
+    cols: List[int] = []
+    for col, track in enumerate(mapper.tracks.values()):
+        for cam_id in track.observations:
+            if cam_id in cam_to_row:
+                rows.append(cam_to_row[cam_id])
+                cols.append(col)
+    A = csr_matrix(
+        (np.ones(len(rows), dtype=np.int32), (rows, cols)),
+        shape=(len(cam_ids), len(mapper.tracks)),
+    )
+    C = triu(A @ A.T, k=1).tocoo()
+    keep = C.data >= min_shared
 
     neighbors: Dict[int, List[int]] = {cam_id: [] for cam_id in mapper.cameras}
-    for (a, b), cnt in counts.items():
-        if cnt >= min_shared:
-            neighbors[a].append((b, cnt))
-            neighbors[b].append((a, cnt))
+    for i, j, cnt in zip(C.row[keep], C.col[keep], C.data[keep]):
+        a, b = cam_ids[i], cam_ids[j]
+        neighbors[a].append((b, int(cnt)))
+        neighbors[b].append((a, int(cnt)))
 
     # keep top_k by shared count
     pruned: Dict[int, List[int]] = {}
     for cam_id, adj in neighbors.items():
-        adj_sorted = sorted(adj, key=lambda x: x[1], reverse=True)
-        pruned[cam_id] = [nid for nid, _ in adj_sorted[:top_k]]
+        pruned[cam_id] = top_k_by_count(adj, top_k)
     return pruned
 
 
@@ -93,46 +101,52 @@ def export_to_web(
     out_root.mkdir(parents=True, exist_ok=True)
     images_dir.mkdir(parents=True, exist_ok=True)
 
-    # copy ply
+    # copy ply; unlike the images it is never hard-linked, so the viewer's
+    # copy is independent of later rewrites of ply_path
     ply_src = Path(ply_path)
     ply_dst = out_root / "model.ply"
     if ply_src.exists():
-        copy2(ply_src, ply_dst)
+        ply_dst.unlink(missing_ok=True)  # drop a hard link left by an older export
+        shutil.copyfile(ply_src, ply_dst)
 
     covis = _compute_covisibility(mapper, min_shared=min_shared, top_k=top_k)
 
+    # Convert all poses to Three.js coords in one batch
+    cam_ids = sorted(mapper.cameras)
+    R_wc = np.array([mapper.cameras[cam_id].R for cam_id in cam_ids]).reshape(-1, 3, 3)
+    t = np.array([mapper.cameras[cam_id].t for cam_id in cam_ids]).reshape(-1, 3)
+    centers_three = _flip_cv_to_three(_camera_center(R_wc, t))
+    quats = Rotation.from_matrix(_rot_cv_to_three_world(R_wc)).as_quat()  # x, y, z, w
+
     cameras_export: List[CameraExport] = []
-    for cam_id in sorted(mapper.cameras):
-        cam = mapper.cameras[cam_id]
-        R_wc = cam.R
-        t = cam.t
-        C_cv = _camera_center(R_wc, t)
-        C_three = _flip_cv_to_three(C_cv)
-        R_three_world = _rot_cv_to_three_world(R_wc)
-        quat = Rotation.from_matrix(R_three_world).as_quat()  # x, y, z, w
+    copies: List[Tuple[Path, Path]] = []
+    for i, cam_id in enumerate(cam_ids):
+        C_three = centers_three[i]
+        quat = quats[i]
 
         img_name = None
         if cam_id in image_paths:
             src_img = Path(image_paths[cam_id])
             if src_img.exists():
                 img_name = src_img.name
-                copy2(src_img, images_dir / img_name)
+                copies.append((src_img, images_dir / img_name))
 
         cameras_export.append(
             CameraExport(
                 id=cam_id,
                 filename=img_name,
-                position=C_three.astype(float).tolist(),
-                quaternion=quat.astype(float).tolist(),
+                position=C_three.tolist(),
+                quaternion=quat.tolist(),
                 neighbors=covis.get(cam_id, []),
             )
         )
 
+    copy_files(copies)
+
     payload = {
         "cameras": [asdict(c) for c in cameras_export],
         "point_cloud_path": "assets/model.ply",
     }
     out_json = out_root / "data.json"
-    with open(out_json, "w", encoding="utf-8") as f:
-        json.dump(payload, f, indent=2)
+    write_json(payload, out_json)
     return out_json
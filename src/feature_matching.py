@@ -2,58 +2,285 @@
 
 from __future__ import annotations
 
+import hashlib
+import os
+import tempfile
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
 import cv2
 import numpy as np
-from typing import Tuple, List
-from .two_view_geometry import FeatureSet, MatchResult
+from typing import Any, Dict, Tuple, List
+from .camera import read_image
+from .two_view_geometry import FeatureSet, MatchResult, pack_keypoints, unpack_keypoints
+
+try:
+    import faiss
+    HAS_FAISS = True
+except ImportError:  # faiss is optional; matching falls back to FLANN / BFMatcher
+    HAS_FAISS = False
+
+
+_EMPTY_INDICES = np.empty(0, dtype=np.int32)
+# One row per knnMatch pair: best/second-best distances for the ratio test
+_KNN_DTYPE = np.dtype([('query', np.int32), ('train', np.int32), ('d0', np.float32), ('d1', np.float32)])
+# Query rows per GEMM block in the tiled brute-force matcher
+BF_TILE_ROWS = 512
+# Query rows per block for ORB Hamming distances
+HAMMING_TILE_ROWS = 256
+# Set bits per byte value, for NumPy versions without np.bitwise_count
+_POPCOUNT_U8 = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+
+
+def _to_dmatches(idx1: np.ndarray, idx2: np.ndarray, distances: np.ndarray) -> List[cv2.DMatch]:
+    return [cv2.DMatch(int(q), int(t), float(d)) for q, t, d in zip(idx1, idx2, distances)]
+
+
+def _root_sift(descriptors: np.ndarray) -> np.ndarray:
+    """L1-normalize and square-root SIFT descriptors in place; rows end up unit-length."""
+    descriptors /= descriptors.sum(axis=1, keepdims=True).clip(min=1e-7)
+    np.sqrt(descriptors, out=descriptors)
+    return descriptors
+
+
+def _thread_map(fn, *iterables: list, max_workers: int | None = None) -> list:
+    """list(map(fn, *iterables)) on a thread pool; OpenCV releases the GIL inside detectAndCompute."""
+    n_items = min(map(len, iterables), default=0)
+    if n_items <= 1:
+        return list(map(fn, *iterables))
+    workers = min(max_workers or os.cpu_count() or 1, n_items)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(fn, *iterables))
 
 
 class FeatureMatcher:
     """Feature detector and matcher using SIFT or ORB."""
 
-    def __init__(self, detector_type: str = 'SIFT', ratio_threshold: float = 0.75):
+    def __init__(
+        self,
+        detector_type: str = 'SIFT',
+        ratio_threshold: float = 0.75,
+        backend: str = 'auto',
+        faiss_nlist: int = 100,
+        faiss_nprobe: int = 8,
+        faiss_index: str = 'ivf_sq8',
+        root_sift: bool = False,
+        max_features: int | None = None,
+    ):
         """
         Initialize feature matcher.
 
         Args:
             detector_type: 'SIFT' or 'ORB'
             ratio_threshold: Lowe's ratio test threshold
+            backend: 'flann', 'bf' (cv2.BFMatcher; Hamming norm for ORB),
+                'faiss' (see faiss_index; exact binary Hamming index for ORB), 'bf_tiled'
+                (exact blocked brute force: GEMM for SIFT, popcount Hamming for
+                ORB) or 'auto' to use faiss for SIFT when it is installed
+                (FLANN otherwise) and 'bf' for ORB
+            faiss_nlist: Maximum number of IVF cells per train-side index
+            faiss_nprobe: IVF cells visited per query
+            faiss_index: SIFT index type for the faiss backend: 'ivf_sq8'
+                (8-bit IVF scalar quantizer), 'sq8' (exhaustive search over 8-bit
+                codes, a quarter of the float32 memory; lossless for OpenCV SIFT,
+                whose descriptor entries are integers in [0, 255]) or 'flat'
+                (exact IndexFlatL2)
+            root_sift: L1-normalize and square-root SIFT descriptors (RootSIFT),
+                so L2 distances between them follow the Hellinger kernel
+            max_features: Keep at most this many keypoints per image, strongest
+                responses first; None keeps every SIFT keypoint (2000 for ORB)
         """
         self.detector_type = detector_type
         self.ratio_threshold = ratio_threshold
+        self.faiss_nlist = faiss_nlist
+        self.faiss_nprobe = faiss_nprobe
+        if faiss_index not in ('ivf_sq8', 'sq8', 'flat'):
+            raise ValueError(f"Unknown faiss index type: {faiss_index}")
+        self.faiss_index = faiss_index
+        self.root_sift = root_sift and detector_type == 'SIFT'
+        self.max_features = max_features
+        # QT_8bit_direct codes are the values rounded to 0..255; RootSIFT entries lie in [0, 1]
+        self._sq8_scale = 255.0 if self.root_sift else 1.0
+
+        # the backend as requested; pickles keep 'auto' so they load where faiss is missing
+        self._requested_backend = backend
+        if backend == 'auto':
+            if detector_type == 'SIFT':
+                backend = 'faiss' if HAS_FAISS else 'flann'
+            else:
+                backend = 'bf'
+        if backend == 'faiss':
+            if not HAS_FAISS:
+                raise ImportError("faiss backend requested but faiss is not installed")
+            # faiss parallelizes each search over queries with OpenMP
+            faiss.omp_set_num_threads(os.cpu_count() or 1)
+        if backend not in ('flann', 'bf', 'faiss', 'bf_tiled'):
+            raise ValueError(f"Unknown matcher backend: {backend}")
+        self.backend = backend
 
         if detector_type == 'SIFT':
-            self.detector = cv2.SIFT_create()
+            self.detector = cv2.SIFT_create(nfeatures=max_features or 0)
             FLANN_INDEX_KDTREE = 1
-            index_params = dict(algorithm=FLANN_INDEX_KDTREE, trees=5)
-            search_params = dict(checks=50)
-            self.matcher = cv2.FlannBasedMatcher(index_params, search_params)
+            self._index_params = dict(algorithm=FLANN_INDEX_KDTREE, trees=5)
+            self._bf_norm = cv2.NORM_L2
         elif detector_type == 'ORB':
-            self.detector = cv2.ORB_create(nfeatures=2000)
+            self.detector = cv2.ORB_create(nfeatures=max_features or 2000)
             FLANN_INDEX_LSH = 6
-            index_params = dict(algorithm=FLANN_INDEX_LSH,
-                               table_number=6,
-                               key_size=12,
-                               multi_probe_level=1)
-            search_params = dict(checks=50)
-            self.matcher = cv2.FlannBasedMatcher(index_params, search_params)
+            self._index_params = dict(algorithm=FLANN_INDEX_LSH,
+                                      table_number=6,
+                                      key_size=12,
+                                      multi_probe_level=1)
+            self._bf_norm = cv2.NORM_HAMMING
         else:
             raise ValueError(f"Unknown detector type: {detector_type}")
+        self._search_params = dict(checks=50)
+        self.matcher = self._new_cv_matcher()
+
+        # FLANN matchers / faiss indices already built over a train-side descriptor
+        # array, keyed by id(); the weakref guards against id reuse and evicts dead entries
+        self._trained: Dict[int, Tuple[weakref.ref, Any]] = {}
+
+    def __getstate__(self) -> dict:
+        # OpenCV detectors/matchers and faiss indices don't pickle; keep the settings
+        # and rebuild them (indices are rebuilt lazily on the next match)
+        return dict(
+            detector_type=self.detector_type, ratio_threshold=self.ratio_threshold,
+            backend=self._requested_backend, faiss_nlist=self.faiss_nlist, faiss_nprobe=self.faiss_nprobe,
+            faiss_index=self.faiss_index, root_sift=self.root_sift, max_features=self.max_features,
+        )
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(**state)
 
     def detect_and_compute(self, image: np.ndarray) -> Tuple[List, np.ndarray]:
         """
         Detect keypoints and compute descriptors.
 
         Args:
-            image: Input image (BGR)
+            image: Input image (BGR, or already grayscale e.g. from IMREAD_GRAYSCALE)
 
         Returns:
-            Tuple of (keypoints, descriptors)
+            Tuple of (keypoints, descriptors); descriptors are contiguous uint8
+            for ORB and float32 for SIFT, so matching never re-casts them
         """
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         keypoints, descriptors = self.detector.detectAndCompute(gray, None)
+        if descriptors is not None:
+            descriptors = np.ascontiguousarray(
+                descriptors, dtype=np.uint8 if self.detector_type == 'ORB' else np.float32
+            )
+        if self.root_sift and descriptors is not None:
+            descriptors = _root_sift(descriptors)
         return keypoints, descriptors
 
+    def detect_and_compute_batch(
+        self, images: List[np.ndarray], max_workers: int | None = None
+    ) -> List[Tuple[List, np.ndarray]]:
+        """
+        Detect keypoints and compute descriptors for several images concurrently.
+
+        OpenCV releases the GIL inside detectAndCompute, so threads scale with cores.
+
+        Args:
+            images: Input images (BGR or grayscale)
+            max_workers: Thread count; defaults to os.cpu_count()
+
+        Returns:
+            List of (keypoints, descriptors), in the order of images
+        """
+        return _thread_map(self.detect_and_compute, images, max_workers=max_workers)
+
+    def _new_cv_matcher(self):
+        """Untrained OpenCV matcher for the 'flann'/'bf' knnMatch path."""
+        if self.backend == 'bf':
+            return cv2.BFMatcher(self._bf_norm, crossCheck=False)
+        return cv2.FlannBasedMatcher(self._index_params, self._search_params)
+
+    def _build_faiss_index(self, desc2: np.ndarray):
+        """Build a faiss index over desc2 (binary Hamming for ORB, L2 per faiss_index for SIFT)."""
+        if self.detector_type == 'ORB':
+            index = faiss.IndexBinaryFlat(desc2.shape[1] * 8)
+            index.add(desc2)
+            return index
+
+        desc2 = np.ascontiguousarray(desc2, dtype=np.float32)
+        dim = desc2.shape[1]
+        if self.faiss_index == 'flat':
+            index = faiss.IndexFlatL2(dim)
+            index.add(desc2)
+            return index
+        if self.faiss_index == 'sq8':
+            index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit_direct, faiss.METRIC_L2)
+            index.add(desc2 * self._sq8_scale if self._sq8_scale != 1.0 else desc2)
+            return index
+        # IVF training wants ~39 points per cell; shrink nlist for small images
+        nlist = max(1, min(self.faiss_nlist, len(desc2) // 39))
+        quantizer = faiss.IndexFlatL2(dim)
+        index = faiss.IndexIVFScalarQuantizer(
+            quantizer, dim, nlist, faiss.ScalarQuantizer.QT_8bit
+        )
+        index.train(desc2)
+        index.add(desc2)
+        index.nprobe = min(self.faiss_nprobe, nlist)
+        return index
+
+    def _trained_index(self, desc2: np.ndarray):
+        """Return a matcher/index built over desc2, reusing it across calls."""
+        key = id(desc2)
+        entry = self._trained.get(key)
+        if entry is not None and entry[0]() is desc2:
+            return entry[1]
+
+        if self.backend == 'faiss':
+            index = self._build_faiss_index(desc2)
+        else:
+            index = self._new_cv_matcher()
+            # FLANN/BF keep a reference to what it indexes; give it a copy so the cache
+            # entry dies with the caller's array
+            index.add([desc2.copy()])
+            index.train()
+
+        trained = self._trained
+
+        def _evict(ref: weakref.ref) -> None:
+            if trained.get(key, (None,))[0] is ref:
+                del trained[key]
+
+        trained[key] = (weakref.ref(desc2, _evict), index)
+        return index
+
+    def match_indices(
+        self, desc1: np.ndarray, desc2: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Match features using Lowe's ratio test, returning index arrays.
+
+        Args:
+            desc1: Descriptors from image 1 (query)
+            desc2: Descriptors from image 2 (train)
+
+        Returns:
+            Tuple of (idx1, idx2, distances) for the good matches
+        """
+        if desc1 is None or desc2 is None or len(desc1) < 2 or len(desc2) < 2:
+            return _EMPTY_INDICES, _EMPTY_INDICES, np.empty(0, dtype=np.float32)
+
+        if self.backend == 'faiss':
+            return self._match_faiss(desc1, desc2)
+        if self.backend == 'bf_tiled':
+            return self._match_bf_tiled(desc1, desc2)
+
+        knn = self._trained_index(desc2).knnMatch(desc1, k=2)
+        pairs = [p for p in knn if len(p) == 2]
+        rows = np.fromiter(
+            ((m.queryIdx, m.trainIdx, m.distance, n.distance) for m, n in pairs),
+            dtype=_KNN_DTYPE,
+            count=len(pairs),
+        )
+        good = rows['d0'] < self.ratio_threshold * rows['d1']
+        return rows['query'][good], rows['train'][good], rows['d0'][good]
+
     def match_features(self, desc1: np.ndarray, desc2: np.ndarray) -> List[cv2.DMatch]:
         """
         Match features using Lowe's ratio test.
@@ -65,58 +292,230 @@ class FeatureMatcher:
         Returns:
             List of good matches
         """
-        if desc1 is None or desc2 is None or len(desc1) < 2 or len(desc2) < 2:
-            return []
+        idx1, idx2, distances = self.match_indices(desc1, desc2)
+        return _to_dmatches(idx1, idx2, distances)
 
+    def _match_faiss(
+        self, desc1: np.ndarray, desc2: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Two-nearest-neighbour search in a faiss index with Lowe's ratio test."""
+        index = self._trained_index(desc2)
         if self.detector_type == 'ORB':
-            desc1 = desc1.astype(np.uint8)
-            desc2 = desc2.astype(np.uint8)
+            dist, nn = index.search(desc1, 2)  # Hamming distances
+            good = (nn[:, 1] >= 0) & (dist[:, 0] < self.ratio_threshold * dist[:, 1])
+            query = np.flatnonzero(good).astype(np.int32)
+            return query, nn[query, 0].astype(np.int32), dist[query, 0].astype(np.float32)
 
-        matches = self.matcher.knnMatch(desc1, desc2, k=2)
+        desc1 = np.ascontiguousarray(desc1, dtype=np.float32)
+        if self.faiss_index == 'sq8' and self._sq8_scale != 1.0:
+            desc1 = desc1 * self._sq8_scale
+        dist2, nn = index.search(desc1, 2)
+        if self.faiss_index == 'sq8' and self._sq8_scale != 1.0:
+            dist2 /= self._sq8_scale ** 2
+        # Distances are squared L2, so the ratio is squared as well
+        good = (nn[:, 1] >= 0) & (dist2[:, 0] < self.ratio_threshold ** 2 * dist2[:, 1])
+        query = np.flatnonzero(good).astype(np.int32)
+        return query, nn[query, 0].astype(np.int32), np.sqrt(dist2[query, 0])
 
-        good_matches = []
-        for match_pair in matches:
-            if len(match_pair) == 2:
-                m, n = match_pair
-                if m.distance < self.ratio_threshold * n.distance:
-                    good_matches.append(m)
+    def _match_bf_tiled(
+        self, desc1: np.ndarray, desc2: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Exact two-nearest-neighbour search as blocked GEMM with Lowe's ratio test."""
+        if self.detector_type == 'ORB':
+            return self._match_hamming_tiled(desc1, desc2)
+        desc1 = np.ascontiguousarray(desc1, dtype=np.float32)
+        desc2 = np.ascontiguousarray(desc2, dtype=np.float32)
+        b2 = np.einsum('ij,ij->i', desc2, desc2)
+        desc2_t = desc2.T
+        n1 = len(desc1)
+        nn = np.empty((n1, 2), dtype=np.int32)
+        dist2 = np.empty((n1, 2), dtype=np.float32)
+        for start in range(0, n1, BF_TILE_ROWS):
+            block = desc1[start:start + BF_TILE_ROWS]
+            # ||a||^2 + ||b||^2 - 2 a.b; the row term doesn't change the ranking
+            d2 = block @ desc2_t
+            d2 *= -2.0
+            d2 += b2
+            top2 = np.argpartition(d2, 1, axis=1)[:, :2]
+            top_d2 = np.take_along_axis(d2, top2, axis=1)
+            top_d2 += np.einsum('ij,ij->i', block, block)[:, None]
+            order = np.argsort(top_d2, axis=1)
+            nn[start:start + len(block)] = np.take_along_axis(top2, order, axis=1)
+            dist2[start:start + len(block)] = np.take_along_axis(top_d2, order, axis=1)
+        np.maximum(dist2, 0.0, out=dist2)  # cancellation can dip slightly below zero
+        good = dist2[:, 0] < self.ratio_threshold ** 2 * dist2[:, 1]
+        query = np.flatnonzero(good).astype(np.int32)
+        return query, nn[query, 0], np.sqrt(dist2[query, 0])
+
+    def _match_hamming_tiled(
+        self, desc1: np.ndarray, desc2: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Exact two-nearest-neighbour Hamming search over packed ORB descriptors."""
+        if hasattr(np, 'bitwise_count') and desc1.shape[1] % 8 == 0:
+            # XOR/popcount whole 64-bit words rather than single bytes
+            words1, words2 = desc1.view(np.uint64), desc2.view(np.uint64)
+            popcount = np.bitwise_count
+        else:
+            words1, words2 = desc1, desc2
+            popcount = _POPCOUNT_U8.__getitem__
+        n1 = len(desc1)
+        nn = np.empty((n1, 2), dtype=np.int32)
+        dist = np.empty((n1, 2), dtype=np.float32)
+        for start in range(0, n1, HAMMING_TILE_ROWS):
+            block = words1[start:start + HAMMING_TILE_ROWS]
+            d = np.zeros((len(block), len(words2)), dtype=np.uint16)
+            for w in range(words1.shape[1]):
+                d += popcount(np.bitwise_xor(block[:, w, None], words2[None, :, w]))
+            top2 = np.argpartition(d, 1, axis=1)[:, :2]
+            top_d = np.take_along_axis(d, top2, axis=1)
+            order = np.argsort(top_d, axis=1, kind='stable')
+            nn[start:start + len(block)] = np.take_along_axis(top2, order, axis=1)
+            dist[start:start + len(block)] = np.take_along_axis(top_d, order, axis=1)
+        good = dist[:, 0] < self.ratio_threshold * dist[:, 1]
+        query = np.flatnonzero(good).astype(np.int32)
+        return query, nn[query, 0], dist[query, 0]
 
-        return good_matches
 
+# Shared SIFT matchers used by match_features when no matcher is passed in
+_DEFAULT_MATCHERS: Dict[float, FeatureMatcher] = {}
 
-def match_features(featureset1: FeatureSet, featureset2: FeatureSet, ratio_threshold: float = 0.75) -> MatchResult:
+
+def _default_matcher(ratio_threshold: float) -> FeatureMatcher:
+    matcher = _DEFAULT_MATCHERS.get(ratio_threshold)
+    if matcher is None:
+        matcher = FeatureMatcher(detector_type='SIFT', ratio_threshold=ratio_threshold)
+        _DEFAULT_MATCHERS[ratio_threshold] = matcher
+    return matcher
+
+
+def match_features(
+    featureset1: FeatureSet,
+    featureset2: FeatureSet,
+    ratio_threshold: float = 0.75,
+    matcher: FeatureMatcher | None = None,
+) -> MatchResult:
     """
     Match features between two feature sets using Lowe's ratio test.
 
     Args:
         featureset1: FeatureSet from image 1
         featureset2: FeatureSet from image 2
-        ratio_threshold: Lowe's ratio test threshold
+        ratio_threshold: Lowe's ratio test threshold (ignored when matcher is given)
+        matcher: Matcher to reuse; defaults to a shared SIFT matcher, so the
+            FLANN index over featureset2's descriptors is built only once
 
     Returns:
         MatchResult with matches and point correspondences
     """
-    matcher = FeatureMatcher(detector_type='SIFT', ratio_threshold=ratio_threshold)
-    matches = matcher.match_features(featureset1.descriptors, featureset2.descriptors)
-
-    if not matches:
-        return MatchResult(
-            matches=[],
-            idx1=np.array([], dtype=np.int32),
-            idx2=np.array([], dtype=np.int32),
-            pts1=np.empty((0, 2), dtype=np.float32),
-            pts2=np.empty((0, 2), dtype=np.float32)
-        )
-
-    idx1 = np.array([m.queryIdx for m in matches], dtype=np.int32)
-    idx2 = np.array([m.trainIdx for m in matches], dtype=np.int32)
-    pts1 = np.array([featureset1.keypoints[m.queryIdx].pt for m in matches], dtype=np.float32)
-    pts2 = np.array([featureset2.keypoints[m.trainIdx].pt for m in matches], dtype=np.float32)
+    if matcher is None:
+        matcher = _default_matcher(ratio_threshold)
+    idx1, idx2, distances = matcher.match_indices(featureset1.descriptors, featureset2.descriptors)
 
     return MatchResult(
-        matches=matches,
         idx1=idx1,
         idx2=idx2,
-        pts1=pts1,
-        pts2=pts2
+        pts1=featureset1.pts_xy[idx1],
+        pts2=featureset2.pts_xy[idx2],
+        distances=distances,
     )
+
+
+def _cache_path(
+    path: Path, matcher: FeatureMatcher, max_dimension: int | None, fast_decode: bool, cache_dir: Path
+) -> Path:
+    """Cache file for path's features; changes with the file's mtime/size and detector settings."""
+    stat = path.stat()
+    key = repr((
+        str(path.resolve()), stat.st_mtime_ns, stat.st_size,
+        matcher.detector_type, matcher.root_sift, matcher.max_features, max_dimension, fast_decode,
+    ))
+    return cache_dir / f"{hashlib.blake2b(key.encode(), digest_size=16).hexdigest()}.npz"
+
+
+def cached_detect(
+    path: str | Path,
+    matcher: FeatureMatcher,
+    image: np.ndarray | None = None,
+    cache_dir: str | Path = "cache/features",
+    max_dimension: int | None = None,
+    fast_decode: bool = True,
+) -> Tuple[List, np.ndarray]:
+    """
+    detect_and_compute for an image file, memoized on disk.
+
+    Args:
+        path: Image file; its path, mtime and size key the cache entry
+        matcher: Matcher whose detector settings are part of the key
+        image: Already decoded (and, with max_dimension, already downscaled)
+            image, to skip cv2.imread on a cache miss
+        cache_dir: Directory holding the .npz cache files
+        max_dimension: Longest image edge features are detected at; part of the key
+        fast_decode: Whether images are decoded at reduced size (see camera.read_image);
+            part of the key
+
+    Returns:
+        Tuple of (keypoints, descriptors), as from matcher.detect_and_compute
+    """
+    path = Path(path)
+    cache_file = _cache_path(path, matcher, max_dimension, fast_decode, Path(cache_dir))
+    if cache_file.exists():
+        with np.load(cache_file) as data:
+            kp = data['keypoints']
+            descriptors = data['descriptors'] if len(kp) else None
+        if descriptors is not None and matcher.detector_type == 'SIFT':
+            descriptors = descriptors.astype(np.float32, copy=False)
+        return unpack_keypoints(kp), descriptors
+
+    if image is None:
+        image, _ = read_image(str(path), max_dimension, fast_decode=fast_decode)
+    keypoints, descriptors = matcher.detect_and_compute(image)
+
+    kp = pack_keypoints(keypoints)
+    stored = descriptors if descriptors is not None else np.empty((0, 0), dtype=np.float32)
+    if matcher.detector_type == 'SIFT' and not matcher.root_sift:
+        # OpenCV SIFT entries are integers in [0, 255]: store them as uint8, a quarter of the size
+        as_u8 = stored.astype(np.uint8)
+        if np.array_equal(as_u8, stored):
+            stored = as_u8
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    # A private temp file per writer, so concurrent writers of one entry can't interleave
+    with tempfile.NamedTemporaryFile(dir=cache_file.parent, suffix='.tmp.npz', delete=False) as tmp:
+        np.savez(tmp, keypoints=kp, descriptors=stored)
+    os.replace(tmp.name, cache_file)  # never leave a half-written entry behind
+    return keypoints, descriptors
+
+
+def cached_detect_batch(
+    paths: List[str | Path],
+    matcher: FeatureMatcher,
+    images: List[np.ndarray | None] | None = None,
+    cache_dir: str | Path = "cache/features",
+    max_dimension: int | None = None,
+    fast_decode: bool = True,
+    max_workers: int | None = None,
+) -> List[Tuple[List, np.ndarray]]:
+    """
+    cached_detect for several image files concurrently.
+
+    Uses the same thread pool helper as FeatureMatcher.detect_and_compute_batch.
+
+    Args:
+        paths: Image files
+        matcher: Matcher whose detector settings are part of the key
+        images: Already decoded images matching paths (entries may be None)
+        cache_dir: Directory holding the .npz cache files
+        max_dimension: Longest image edge features are detected at; part of the key
+        fast_decode: Whether images are decoded at reduced size; part of the key
+        max_workers: Thread count; defaults to os.cpu_count()
+
+    Returns:
+        List of (keypoints, descriptors), in the order of paths
+    """
+    if images is None:
+        images = [None] * len(paths)
+
+    def detect(path, image):
+        return cached_detect(path, matcher, image=image, cache_dir=cache_dir,
+                             max_dimension=max_dimension, fast_decode=fast_decode)
+
+    return _thread_map(detect, paths, images, max_workers=max_workers)
@@ -2,14 +2,28 @@
 
 from __future__ import annotations
 
+from array import array
 from dataclasses import dataclass, field
-from typing import Dict, List, Tuple
+from functools import cached_property
+from typing import Dict, List, Optional, Tuple
 
 import cv2
 import numpy as np
 
 from . import feature_matching
-from .two_view_geometry import build_projection_matrix, triangulate_points
+from .bundle_adjustment import run_bundle_adjustment
+from .two_view_geometry import build_projection_matrix, cheirality_mask, triangulate_points
+
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:  # numba is optional; the NumPy filter below is used instead
+    HAS_NUMBA = False
+
+# kp_track_lookup keys are image_idx * _KP_KEY_STRIDE + keypoint index
+_KP_KEY_STRIDE = 1 << 32
+# Newly triangulated points farther than this from the origin are dropped
+_MAX_POINT_DIST = 1000.0
 
 
 @dataclass
@@ -17,9 +31,21 @@ class CameraPose:
     image_idx: int
     R: np.ndarray
     t: np.ndarray
+    # K @ [R | t] for the K object it was built with; cleared when R or t is reassigned
+    _P: Optional[np.ndarray] = field(default=None, init=False, repr=False, compare=False)
+    _P_K: Optional[np.ndarray] = field(default=None, init=False, repr=False, compare=False)
+
+    def __setattr__(self, name: str, value) -> None:
+        if name in ('R', 't'):
+            object.__setattr__(self, '_P', None)
+        object.__setattr__(self, name, value)
 
     def projection_matrix(self, K: np.ndarray) -> np.ndarray:
-        return build_projection_matrix(self.R, self.t, K)
+        # K is shared by the whole mapper, so its identity is the cache key
+        if self._P is None or self._P_K is not K:
+            self._P = build_projection_matrix(self.R, self.t, K)
+            self._P_K = K
+        return self._P
 
 
 @dataclass
@@ -43,29 +69,202 @@ class ImageFeatures:
     def descriptors(self) -> np.ndarray:
         return self.feature_set.descriptors
 
+    @property
+    def pts_xy(self) -> np.ndarray:
+        return self.feature_set.pts_xy
+
+    @cached_property
+    def gray(self) -> np.ndarray:
+        """Grayscale copy of the image, converted once on first use."""
+        if self.image.ndim == 2:
+            return self.image
+        return cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
+
 
-def _sample_color(image: np.ndarray, pt: Tuple[float, float]) -> np.ndarray:
+def _sample_colors(image: np.ndarray, pts_xy: np.ndarray) -> np.ndarray:
+    """Colors at the nearest pixel to each of the Nx2 points, clamped to the image."""
     h, w = image.shape[:2]
-    x = int(round(pt[0]))
-    y = int(round(pt[1]))
-    x = max(0, min(w - 1, x))
-    y = max(0, min(h - 1, y))
-    return image[y, x].astype(np.float32)
+    xs = np.clip(np.round(pts_xy[:, 0]).astype(np.int32), 0, w - 1)
+    ys = np.clip(np.round(pts_xy[:, 1]).astype(np.int32), 0, h - 1)
+    colors = image[ys, xs].astype(np.float32)
+    if image.ndim == 2:  # grayscale: replicate intensity into three channels
+        colors = np.repeat(colors[:, None], 3, axis=1)
+    return colors
+
+
+if HAS_NUMBA:
+    @njit(cache=True, nogil=True)
+    def _pixel_numba(img, x, y, c):
+        """Channel c of the nearest pixel to (x, y), clamped; single-channel images repeat."""
+        h, w, channels = img.shape
+        px = min(max(int(np.rint(x)), 0), w - 1)
+        py = min(max(int(np.rint(y)), 0), h - 1)
+        return np.float32(img[py, px, c if channels > 1 else 0])
+
+    @njit(cache=True, nogil=True)
+    def _triangulation_filter_numba(points3d, r_z, t_z, max_dist_sq, img_new, img_ref, new_xy, ref_xy):
+        """
+        Fused validity mask and color sampling for freshly triangulated points.
+
+        Keeps finite points within sqrt(max_dist_sq) of the origin and in front of
+        the new camera (depth = r_z . X + t_z); images are HxWxC with C == 1 or 3.
+
+        Returns:
+            (valid_idx, colors): indices into points3d and their mean float32 colors
+        """
+        n = points3d.shape[0]
+        valid = np.empty(n, dtype=np.int64)
+        n_valid = 0
+        for i in range(n):
+            x, y, z = points3d[i, 0], points3d[i, 1], points3d[i, 2]
+            if not (np.isfinite(x) and np.isfinite(y) and np.isfinite(z)):
+                continue
+            if x * x + y * y + z * z >= max_dist_sq:
+                continue
+            if r_z[0] * x + r_z[1] * y + r_z[2] * z + t_z <= 0.0:
+                continue
+            valid[n_valid] = i
+            n_valid += 1
+
+        colors = np.empty((n_valid, 3), dtype=np.float32)
+        half = np.float32(0.5)
+        for j in range(n_valid):
+            i = valid[j]
+            for c in range(3):
+                colors[j, c] = half * (
+                    _pixel_numba(img_new, new_xy[i, 0], new_xy[i, 1], c)
+                    + _pixel_numba(img_ref, ref_xy[i, 0], ref_xy[i, 1], c)
+                )
+        return valid[:n_valid], colors
+
+
+def _triangulation_filter(
+    points3d: np.ndarray,
+    cam: CameraPose,
+    img_new: np.ndarray,
+    img_ref: np.ndarray,
+    new_xy: np.ndarray,
+    ref_xy: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Select finite, not extremely distant points in front of cam and average their colors.
+
+    Returns:
+        (valid_idx, colors) with valid_idx indexing points3d/new_xy/ref_xy
+    """
+    if HAS_NUMBA:
+        return _triangulation_filter_numba(
+            points3d,
+            np.ascontiguousarray(cam.R[2], dtype=np.float64),
+            float(np.ravel(cam.t)[2]),
+            _MAX_POINT_DIST ** 2,
+            img_new if img_new.ndim == 3 else img_new[:, :, None],
+            img_ref if img_ref.ndim == 3 else img_ref[:, :, None],
+            new_xy,
+            ref_xy,
+        )
+
+    mask = cheirality_mask(points3d, (cam.R,), (cam.t,), max_dist=_MAX_POINT_DIST)
+    valid_idx = np.flatnonzero(mask)
+    colors = 0.5 * (
+        _sample_colors(img_new, new_xy[valid_idx]) + _sample_colors(img_ref, ref_xy[valid_idx])
+    )
+    return valid_idx, colors
+
+
+def _warm_up_numba() -> None:
+    """Compile the triangulation filter for uint8 color/gray images ahead of the hot path."""
+    global _NUMBA_WARM
+    if not HAS_NUMBA or _NUMBA_WARM:
+        return
+    pose = CameraPose(image_idx=-1, R=np.eye(3), t=np.zeros(3))
+    pts = np.ones((1, 3))
+    xy = np.zeros((1, 2), dtype=np.float32)
+    for img in (np.zeros((1, 1, 3), dtype=np.uint8), np.zeros((1, 1), dtype=np.uint8)):
+        _triangulation_filter(pts, pose, img, img, xy, xy)
+    _NUMBA_WARM = True
+
+
+_NUMBA_WARM = False
 
 
 class IncrementalMapper:
-    def __init__(self, K: np.ndarray, min_pnp_points: int = 40) -> None:
+    def __init__(
+        self,
+        K: np.ndarray,
+        min_pnp_points: int = 40,
+        matcher: feature_matching.FeatureMatcher | None = None,
+    ) -> None:
         self.K = K
         self.min_pnp_points = min_pnp_points
         self.cameras: Dict[int, CameraPose] = {}
         self.tracks: Dict[int, MapPoint] = {}
-        self.kp_track_lookup: Dict[Tuple[int, int], int] = {}
+        # (image_idx, kp_idx) -> track id, packed into one int key (see _kp_key)
+        self.kp_track_lookup: Dict[int, int] = {}
+        # Per-image flags of which keypoints already belong to a track
+        self._kp_has_track: Dict[int, np.ndarray] = {}
         self.images: Dict[int, ImageFeatures] = {}
+        # Flat observation arrays, one entry per (track, image, keypoint)
+        self.obs_track = array('i')
+        self.obs_cam = array('i')
+        self.obs_kp = array('i')
         self._next_track_id = 0
+        # Reused for every match so each image's FLANN index is built once; pass
+        # the detecting matcher for non-SIFT descriptors
+        self._matcher = matcher if matcher is not None else feature_matching.FeatureMatcher('SIFT')
+        # Pairwise matches keyed by (smaller idx, larger idx)
+        self._match_cache: Dict[Tuple[int, int], feature_matching.MatchResult] = {}
+        _warm_up_numba()
 
     def register_image(self, idx: int, features: ImageFeatures) -> None:
         self.images[idx] = features
 
+    @staticmethod
+    def _kp_key(image_idx: int, kp_idx: int) -> int:
+        return image_idx * _KP_KEY_STRIDE + int(kp_idx)
+
+    def _add_observation(self, track_id: int, image_idx: int, kp_idx: int) -> None:
+        self.tracks[track_id].observations[image_idx] = kp_idx
+        self.kp_track_lookup[self._kp_key(image_idx, kp_idx)] = track_id
+        self._track_flags(image_idx)[kp_idx] = True
+        self.obs_track.append(track_id)
+        self.obs_cam.append(image_idx)
+        self.obs_kp.append(int(kp_idx))
+
+    def _track_flags(self, image_idx: int) -> np.ndarray:
+        flags = self._kp_has_track.get(image_idx)
+        if flags is None:
+            flags = np.zeros(len(self.images[image_idx].pts_xy), dtype=bool)
+            self._kp_has_track[image_idx] = flags
+        return flags
+
+    def _get_match(self, idx_a: int, idx_b: int) -> feature_matching.MatchResult:
+        """Matches from image idx_a (idx1/pts1) to image idx_b (idx2/pts2), computed once per pair."""
+        key = (min(idx_a, idx_b), max(idx_a, idx_b))
+        match = self._match_cache.get(key)
+        if match is None:
+            match = feature_matching.match_features(
+                self.images[key[0]].feature_set,
+                self.images[key[1]].feature_set,
+                matcher=self._matcher,
+            )
+            self._match_cache[key] = match
+        if idx_a == key[0]:
+            return match
+        return feature_matching.MatchResult(
+            idx1=match.idx2,
+            idx2=match.idx1,
+            pts1=match.pts2,
+            pts2=match.pts1,
+            distances=match.distances,
+        )
+
+    def _new_track(self, coord: np.ndarray, color: np.ndarray) -> int:
+        track_id = self._next_track_id
+        self._next_track_id += 1
+        self.tracks[track_id] = MapPoint(id=track_id, coord=coord, color=color)
+        return track_id
+
     def _add_camera(self, idx: int, R: np.ndarray, t: np.ndarray) -> None:
         self.cameras[idx] = CameraPose(image_idx=idx, R=R, t=t.reshape(3))
 
@@ -82,28 +281,23 @@ class IncrementalMapper:
         feats0 = self.images[idx0]
         feats1 = self.images[idx1]
 
-        for order, match_idx in enumerate(reconstruction.match_indices):
-            kp0_idx = match_result.idx1[match_idx]
-            kp1_idx = match_result.idx2[match_idx]
-            coord = reconstruction.points3d[order]
-            color0 = _sample_color(feats0.image, feats0.keypoints[kp0_idx].pt)
-            color1 = _sample_color(feats1.image, feats1.keypoints[kp1_idx].pt)
-            color = (color0 + color1) / 2.0
-            track_id = self._next_track_id
-            self._next_track_id += 1
-            self.tracks[track_id] = MapPoint(
-                id=track_id,
-                coord=coord,
-                color=color,
-                observations={idx0: kp0_idx, idx1: kp1_idx},
-            )
-            self.kp_track_lookup[(idx0, kp0_idx)] = track_id
-            self.kp_track_lookup[(idx1, kp1_idx)] = track_id
+        kp0_indices = match_result.idx1[reconstruction.match_indices]
+        kp1_indices = match_result.idx2[reconstruction.match_indices]
+        colors = 0.5 * (
+            _sample_colors(feats0.image, feats0.pts_xy[kp0_indices])
+            + _sample_colors(feats1.image, feats1.pts_xy[kp1_indices])
+        )
+
+        for coord, color, kp0_idx, kp1_idx in zip(
+            reconstruction.points3d, colors, kp0_indices, kp1_indices
+        ):
+            track_id = self._new_track(coord, color)
+            self._add_observation(track_id, idx0, kp0_idx)
+            self._add_observation(track_id, idx1, kp1_idx)
 
     def _collect_pnp_correspondences(
         self, idx: int
     ) -> Tuple[np.ndarray, np.ndarray, List[int], List[int]]:
-        feats_new = self.images[idx]
         pts3d: List[np.ndarray] = []
         pts2d: List[np.ndarray] = []
         track_ids: List[int] = []
@@ -111,12 +305,9 @@ class IncrementalMapper:
         for ref_idx, cam in self.cameras.items():
             if ref_idx == idx:
                 continue
-            match = feature_matching.match_features(
-                self.images[ref_idx].feature_set,
-                feats_new.feature_set,
-            )
+            match = self._get_match(ref_idx, idx)
             for kp_ref_idx, kp_new_idx, pt_new in zip(match.idx1, match.idx2, match.pts2):
-                track_id = self.kp_track_lookup.get((ref_idx, kp_ref_idx))
+                track_id = self.kp_track_lookup.get(self._kp_key(ref_idx, kp_ref_idx))
                 if track_id is None:
                     continue
                 track = self.tracks[track_id]
@@ -139,15 +330,17 @@ class IncrementalMapper:
             pts2d,
             self.K,
             distCoeffs=None,
-            flags=cv2.SOLVEPNP_SQPNP,
+            flags=cv2.SOLVEPNP_AP3P,  # minimal solver per sample; refined below
             iterationsCount=200,
             reprojectionError=3.0,
             confidence=0.999,
         )
         if not success or inliers is None or len(inliers) < self.min_pnp_points:
             return None
+        inliers = inliers.ravel()
+        rvec, tvec = cv2.solvePnPRefineLM(pts3d[inliers], pts2d[inliers], self.K, None, rvec, tvec)
         R, _ = cv2.Rodrigues(rvec)
-        return R, tvec.reshape(3), inliers.ravel()
+        return R, tvec.reshape(3), inliers
 
     def register_new_view(self, idx: int) -> bool:
         pts3d, pts2d, track_ids, kp_indices = self._collect_pnp_correspondences(idx)
@@ -157,87 +350,131 @@ class IncrementalMapper:
         if result is None:
             return False
         R, t, inliers = result
-        # keep only inlier correspondences
-        inlier_ids = [track_ids[i] for i in inliers]
-        inlier_kps = [kp_indices[i] for i in inliers]
+        # keep only inlier correspondences, one observation per track (last wins)
+        inlier_obs = {track_ids[i]: kp_indices[i] for i in inliers}
         self._add_camera(idx, R, t)
-        for track_id, kp_idx in zip(inlier_ids, inlier_kps):
-            self.tracks[track_id].observations[idx] = kp_idx
-            self.kp_track_lookup[(idx, kp_idx)] = track_id
+        for track_id, kp_idx in inlier_obs.items():
+            self._add_observation(track_id, idx, kp_idx)
 
         self._triangulate_new_points(idx)
         return True
 
+    def _view_rmse(self, idx: int) -> float:
+        """Reprojection RMSE of one registered view over the tracks it observes."""
+        sel = np.flatnonzero(np.asarray(self.obs_cam) == idx)
+        if not len(sel):
+            return 0.0
+        track_ids = np.asarray(self.obs_track)[sel]
+        kp_indices = np.asarray(self.obs_kp)[sel]
+        points = np.array([self.tracks[t].coord for t in track_ids], dtype=np.float64)
+        P = self.cameras[idx].projection_matrix(self.K)
+        proj = points @ P[:, :3].T + P[:, 3]
+        err = proj[:, :2] / proj[:, 2:3] - self.images[idx].pts_xy[kp_indices]
+        return float(np.sqrt(np.mean(err ** 2)))
+
+    def register_views_batched(
+        self,
+        image_indices: List[int],
+        batch_size: int = 8,
+        max_rmse: float = 2.0,
+        max_iterations: int = 10,
+        final_iterations: int = 50,
+        window_size: int | None = None,
+        verbose: bool = False,
+    ) -> List[int]:
+        """
+        Register views with one bundle adjustment per batch instead of per view.
+
+        Views are localized and triangulated one at a time as in
+        register_new_view, but BA only runs once batch_size views are pending,
+        or earlier when a new view's reprojection RMSE exceeds max_rmse. A
+        final BA over all cameras refines the result.
+
+        Args:
+            image_indices: Registered images to localize, in order
+            batch_size: Views registered between two bundle adjustments
+            max_rmse: Per-view reprojection RMSE (pixels) that flushes the batch early
+            max_iterations: Iteration cap of the per-batch BA
+            final_iterations: Iteration cap of the final BA
+            window_size: Cameras optimized by the per-batch BA (None: all of them)
+            verbose: Print one line per bundle adjustment
+
+        Returns:
+            Indices of the views that were registered
+        """
+        registered = []
+        pending = 0
+        for idx in image_indices:
+            if not self.register_new_view(idx):
+                continue
+            registered.append(idx)
+            pending += 1
+            if pending < batch_size and self._view_rmse(idx) <= max_rmse:
+                continue
+            initial_rmse, final_rmse = run_bundle_adjustment(
+                self, max_iterations=max_iterations, quick_tolerances=True, window_size=window_size
+            )
+            if verbose:
+                print(f"  BA after {pending} view(s): RMSE {initial_rmse:.3f} -> {final_rmse:.3f} pixels")
+            pending = 0
+
+        if registered:
+            initial_rmse, final_rmse = run_bundle_adjustment(self, max_iterations=final_iterations)
+            if verbose:
+                print(f"  Final BA over {len(self.cameras)} cameras: "
+                      f"RMSE {initial_rmse:.3f} -> {final_rmse:.3f} pixels")
+        return registered
+
     def _triangulate_new_points(self, idx: int) -> None:
         new_cam = self.cameras[idx]
         feats_new = self.images[idx]
         P_new = new_cam.projection_matrix(self.K)
+
+        # Gather the untracked matches of every reference view first, so the
+        # whole batch is triangulated in one call with a per-point P_ref
+        segments = []  # (ref_idx, ref kp indices, new kp indices)
+        pts_ref, pts_new, P_refs = [], [], []
         for ref_idx, cam in self.cameras.items():
             if ref_idx >= idx:
                 continue
-            feats_ref = self.images[ref_idx]
-            match = feature_matching.match_features(
-                feats_ref.feature_set, feats_new.feature_set
-            )
-            if len(match.matches) < 50:
+            match = self._get_match(ref_idx, idx)
+            if len(match.idx1) < 50:
                 continue
-            pts_ref = []
-            pts_new = []
-            ref_indices = []
-            new_indices = []
-            for local_idx, (kp_ref_idx, kp_new_idx) in enumerate(zip(match.idx1, match.idx2)):
-                if (ref_idx, kp_ref_idx) in self.kp_track_lookup:
-                    continue
-                pts_ref.append(match.pts1[local_idx])
-                pts_new.append(match.pts2[local_idx])
-                ref_indices.append(kp_ref_idx)
-                new_indices.append(kp_new_idx)
-            if not pts_ref:
+            # Only triangulate matches whose reference keypoint has no track yet
+            untracked = ~self._track_flags(ref_idx)[match.idx1]
+            if not untracked.any():
                 continue
-            P_ref = cam.projection_matrix(self.K)
-            pts_ref_np = np.array(pts_ref, dtype=np.float32)
-            pts_new_np = np.array(pts_new, dtype=np.float32)
-            points3d = triangulate_points(pts_ref_np, pts_new_np, P_ref, P_new)
-
-            # Filter for finite and reasonable magnitude values
-            with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
-                finite_mask = np.all(np.isfinite(points3d), axis=1)
-                magnitude_mask = np.linalg.norm(points3d, axis=1) < 1000
-                valid_mask = finite_mask & magnitude_mask
-
-                if not valid_mask.any():
-                    continue
-
-                # Only operate on valid points
-                points3d_valid = points3d[valid_mask]
-
-                # depth filtering
-                points_cam_new = (new_cam.R @ points3d_valid.T + new_cam.t.reshape(3, 1)).T
-                depth_mask = points_cam_new[:, 2] > 0
+            segments.append((ref_idx, match.idx1[untracked], match.idx2[untracked]))
+            pts_ref.append(match.pts1[untracked])
+            pts_new.append(match.pts2[untracked])
+            P_refs.append(cam.projection_matrix(self.K))
+        if not segments:
+            return
+
+        counts = [len(ref_kps) for _, ref_kps, _ in segments]
+        points3d = triangulate_points(
+            np.concatenate(pts_ref),
+            np.concatenate(pts_new),
+            np.repeat(np.stack(P_refs), counts, axis=0),
+            P_new,
+        )
 
-                # Map back to full mask
-                mask = np.zeros(len(points3d), dtype=bool)
-                valid_indices = np.where(valid_mask)[0]
-                mask[valid_indices[depth_mask]] = True
-            for coord, ref_kp_idx, new_kp_idx, valid in zip(
-                points3d, ref_indices, new_indices, mask
+        start = 0
+        for (ref_idx, ref_indices, new_indices), seg_pts_ref, seg_pts_new, count in zip(
+            segments, pts_ref, pts_new, counts
+        ):
+            seg_points3d = points3d[start:start + count]
+            start += count
+            valid, colors = _triangulation_filter(
+                seg_points3d, new_cam, feats_new.image, self.images[ref_idx].image,
+                seg_pts_new, seg_pts_ref,
+            )
+            for coord, color, ref_kp_idx, new_kp_idx in zip(
+                seg_points3d[valid], colors, ref_indices[valid], new_indices[valid]
             ):
-                if not valid:
-                    continue
-                color_new = _sample_color(feats_new.image, feats_new.keypoints[new_kp_idx].pt)
-                color_ref = _sample_color(feats_ref.image, feats_ref.keypoints[ref_kp_idx].pt)
-                color = (color_new + color_ref) / 2.0
-                track_id = self._next_track_id
-                self._next_track_id += 1
-                mp = MapPoint(
-                    id=track_id,
-                    coord=coord,
-                    color=color,
-                    observations={ref_idx: ref_kp_idx, idx: new_kp_idx},
-                )
-                self.tracks[track_id] = mp
-                self.kp_track_lookup[(ref_idx, ref_kp_idx)] = track_id
-                self.kp_track_lookup[(idx, new_kp_idx)] = track_id
+                track_id = self._new_track(coord, color)
+                self._add_observation(track_id, ref_idx, ref_kp_idx)
+                self._add_observation(track_id, idx, new_kp_idx)
 
     def export_points(self) -> Tuple[np.ndarray, np.ndarray]:
         if not self.tracks:
@@ -247,23 +484,30 @@ class IncrementalMapper:
         return coords, colors
 
     def build_observation_matrices(self):
-        camera_indices = []
-        point_indices = []
-        points_2d = []
-        camera_id_to_idx = {cam_id: i for i, cam_id in enumerate(sorted(self.cameras))}
-        track_id_to_idx = {track_id: i for i, track_id in enumerate(sorted(self.tracks))}
-        for track_id, track in self.tracks.items():
-            for img_idx, kp_idx in track.observations.items():
-                if img_idx not in self.cameras:
-                    continue
-                camera_indices.append(camera_id_to_idx[img_idx])
-                point_indices.append(track_id_to_idx[track_id])
-                kp = self.images[img_idx].keypoints[kp_idx]
-                points_2d.append(kp.pt)
+        cam_ids = np.array(sorted(self.cameras), dtype=np.int64)
+        track_ids = np.array(sorted(self.tracks), dtype=np.int64)
+        camera_id_to_idx = {int(cam_id): i for i, cam_id in enumerate(cam_ids)}
+        track_id_to_idx = {int(track_id): i for i, track_id in enumerate(track_ids)}
+
+        obs_cam = np.array(self.obs_cam, dtype=np.int64)
+        obs_track = np.array(self.obs_track, dtype=np.int64)
+        obs_kp = np.array(self.obs_kp, dtype=np.int64)
+        keep = np.isin(obs_cam, cam_ids) & np.isin(obs_track, track_ids)
+        obs_cam, obs_track, obs_kp = obs_cam[keep], obs_track[keep], obs_kp[keep]
+
+        # Both id lists are sorted, so their positions are the BA indices
+        camera_indices = np.searchsorted(cam_ids, obs_cam)
+        point_indices = np.searchsorted(track_ids, obs_track)
+
+        # Gather 2D observations per camera from the precomputed keypoint arrays
+        points_2d = np.empty((len(obs_kp), 2), dtype=np.float32)
+        for cam_id, cam_idx in camera_id_to_idx.items():
+            obs = camera_indices == cam_idx
+            points_2d[obs] = self.images[cam_id].pts_xy[obs_kp[obs]]
         return (
-            np.array(camera_indices),
-            np.array(point_indices),
-            np.array(points_2d, dtype=np.float32),
+            camera_indices,
+            point_indices,
+            points_2d,
             camera_id_to_idx,
             track_id_to_idx,
         )
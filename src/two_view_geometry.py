@@ -2,28 +2,82 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Tuple
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional, Sequence, Tuple
 
 import cv2
 import numpy as np
 
 
+# cv2.KeyPoint fields as a structured record (feature cache, pickled FeatureSets)
+KEYPOINT_DTYPE = np.dtype([
+    ('x', np.float32), ('y', np.float32), ('size', np.float32), ('angle', np.float32),
+    ('response', np.float32), ('octave', np.int32), ('class_id', np.int32),
+])
+
+
+def pack_keypoints(keypoints: Sequence[cv2.KeyPoint]) -> np.ndarray:
+    """cv2.KeyPoints as a KEYPOINT_DTYPE array (KeyPoints themselves can't be pickled)."""
+    return np.array(
+        [(k.pt[0], k.pt[1], k.size, k.angle, k.response, k.octave, k.class_id) for k in keypoints],
+        dtype=KEYPOINT_DTYPE,
+    )
+
+
+def unpack_keypoints(records: np.ndarray) -> list[cv2.KeyPoint]:
+    """Inverse of pack_keypoints."""
+    return [
+        cv2.KeyPoint(float(x), float(y), float(size), float(angle), float(response), int(octave), int(class_id))
+        for x, y, size, angle, response, octave, class_id in records.tolist()
+    ]
+
+
 @dataclass
 class FeatureSet:
     """Container for keypoints and descriptors."""
     keypoints: list[cv2.KeyPoint]
     descriptors: np.ndarray
+    pts_xy: np.ndarray = field(default=None, repr=False)  # Nx2 float32 keypoint coords
+
+    def __post_init__(self) -> None:
+        if self.pts_xy is None:
+            pts = cv2.KeyPoint_convert(self.keypoints) if len(self.keypoints) else ()
+            self.pts_xy = np.asarray(pts, dtype=np.float32).reshape(-1, 2)
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state['keypoints'] = pack_keypoints(self.keypoints)
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        state['keypoints'] = unpack_keypoints(state['keypoints'])
+        self.__dict__.update(state)
 
 
 @dataclass
 class MatchResult:
     """Container for feature matching results."""
-    matches: list[cv2.DMatch]
     idx1: np.ndarray  # indices into keypoints1
     idx2: np.ndarray  # indices into keypoints2
     pts1: np.ndarray  # 2D points from image 1
     pts2: np.ndarray  # 2D points from image 2
+    distances: np.ndarray | None = None  # descriptor distance per match
+
+    def __len__(self) -> int:
+        return len(self.idx1)
+
+    @property
+    def matches(self) -> list[cv2.DMatch]:
+        """Matches as cv2.DMatch objects, built on demand (e.g. for cv2.drawMatches)."""
+        distances = self.distances if self.distances is not None else np.zeros(len(self.idx1))
+        return [
+            cv2.DMatch(int(q), int(t), float(d))
+            for q, t, d in zip(self.idx1, self.idx2, distances)
+        ]
 
 
 @dataclass
@@ -52,22 +106,87 @@ def build_projection_matrix(R: np.ndarray, t: np.ndarray, K: np.ndarray) -> np.n
     return K @ np.hstack([R, t])
 
 
-def triangulate_points(pts1: np.ndarray, pts2: np.ndarray, P1: np.ndarray, P2: np.ndarray) -> np.ndarray:
+def triangulate_points(
+    pts1: np.ndarray,
+    pts2: np.ndarray,
+    P1: np.ndarray,
+    P2: np.ndarray,
+    use_opencv: bool = False,
+) -> np.ndarray:
     """
     Triangulate 3D points from two views.
 
+    Solves the linear (DLT) system of every point at once: with X = [x, y, z, 1]
+    each view contributes rows u*P[2] - P[0] and v*P[2] - P[1], and the 3x3
+    normal equations are solved in closed form across the whole batch.
+
     Args:
         pts1: Nx2 points in image 1
         pts2: Nx2 points in image 2
-        P1: 3x4 projection matrix for camera 1
-        P2: 3x4 projection matrix for camera 2
+        P1: 3x4 projection matrix for camera 1, or Nx3x4 with one per point
+        P2: 3x4 projection matrix for camera 2, or Nx3x4 with one per point
+        use_opencv: Use cv2.triangulatePoints instead (for validation; 3x4 only)
 
     Returns:
-        Nx3 array of 3D points
+        Nx3 array of 3D points (non-finite where the system is degenerate)
+    """
+    if use_opencv:
+        points_4d = cv2.triangulatePoints(P1, P2, pts1.T, pts2.T)
+        return (points_4d[:3] / points_4d[3]).T
+
+    pts1 = np.asarray(pts1, dtype=np.float64).reshape(-1, 2)
+    pts2 = np.asarray(pts2, dtype=np.float64).reshape(-1, 2)
+    A = np.stack([
+        pts1[:, 0:1] * P1[..., 2, :] - P1[..., 0, :],
+        pts1[:, 1:2] * P1[..., 2, :] - P1[..., 1, :],
+        pts2[:, 0:1] * P2[..., 2, :] - P2[..., 0, :],
+        pts2[:, 1:2] * P2[..., 2, :] - P2[..., 1, :],
+    ], axis=1)  # (N, 4, 4)
+    B = A[:, :, :3]
+    M = np.einsum('nki,nkj->nij', B, B)
+    b = -np.einsum('nki,nk->ni', B, A[:, :, 3])
+
+    # Cramer's rule on the symmetric 3x3 systems M X = b
+    m0, m1, m2 = M[:, :, 0], M[:, :, 1], M[:, :, 2]
+    m12 = np.cross(m1, m2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        inv_det = 1.0 / np.einsum('ni,ni->n', m0, m12)
+        return np.stack([
+            np.einsum('ni,ni->n', b, m12),
+            np.einsum('ni,ni->n', m0, np.cross(b, m2)),
+            np.einsum('ni,ni->n', m0, np.cross(m1, b)),
+        ], axis=1) * inv_det[:, None]
+
+
+def cheirality_mask(
+    points_3d: np.ndarray,
+    Rs: Sequence[np.ndarray],
+    ts: Sequence[np.ndarray],
+    max_dist: Optional[float] = None,
+) -> np.ndarray:
     """
-    points_4d = cv2.triangulatePoints(P1, P2, pts1.T, pts2.T)
-    points_3d = (points_4d[:3] / points_4d[3]).T
-    return points_3d
+    Mask of finite points with positive depth in every given camera.
+
+    Only depth matters, so a single (N, C) product with the z rows of the
+    C world-to-camera poses is evaluated.
+
+    Args:
+        points_3d: Nx3 array of 3D points
+        Rs: Rotations of the C cameras
+        ts: Translations of the C cameras
+        max_dist: Also drop points at least this far from the origin
+
+    Returns:
+        Boolean mask of valid points
+    """
+    z_rows = np.stack([R[2] for R in Rs])  # (C, 3)
+    t_z = np.array([np.ravel(t)[2] for t in ts])
+    with np.errstate(invalid='ignore', over='ignore'):
+        depths = points_3d @ z_rows.T + t_z  # (N, C)
+        mask = np.isfinite(points_3d).all(axis=1) & (depths > 0).all(axis=1)
+        if max_dist is not None:
+            mask &= np.einsum('ij,ij->i', points_3d, points_3d) < max_dist ** 2
+    return mask
 
 
 def reconstruct_two_views(
@@ -83,76 +202,34 @@ def reconstruct_two_views(
         pts1: Nx2 points in image 1
         pts2: Nx2 points in image 2
         K: 3x3 intrinsic matrix
-        match_indices: Optional indices of matches
+        match_indices: Optional indices of matches; None means pts1/pts2 are the
+            matches in order, so no index array is needed
 
     Returns:
-        TwoViewReconstruction object
+        TwoViewReconstruction object; its match_indices index the input matches
     """
-    # Estimate essential matrix
-    E, mask = cv2.findEssentialMat(pts1, pts2, K, method=cv2.RANSAC, prob=0.999, threshold=1.0)
-    inlier_mask = mask.ravel().astype(bool)
-
-    pts1_inliers = pts1[inlier_mask]
-    pts2_inliers = pts2[inlier_mask]
-
-    if match_indices is not None:
-        match_indices = match_indices[inlier_mask]
-
-    # Recover pose
-    _, R, t, pose_mask = cv2.recoverPose(E, pts1_inliers, pts2_inliers, K)
+    # Essential matrix (MAGSAC) and pose in one call; the returned mask is
+    # already the RANSAC inlier mask restricted to points passing cheirality
+    _, _, R, t, pose_mask = cv2.recoverPose(
+        pts1, pts2, K, None, K, None, method=cv2.USAC_MAGSAC, prob=0.999, threshold=1.0
+    )
     pose_mask = pose_mask.ravel().astype(bool)
 
-    pts1_final = pts1_inliers[pose_mask]
-    pts2_final = pts2_inliers[pose_mask]
-
-    if match_indices is not None:
-        match_indices = match_indices[pose_mask]
-    else:
-        # Create sequential indices
-        match_indices = np.arange(len(pts1_final))
+    pts1_final = pts1[pose_mask]
+    pts2_final = pts2[pose_mask]
 
     # Triangulate
     P1 = build_projection_matrix(np.eye(3), np.zeros(3), K)
     P2 = build_projection_matrix(R, t.ravel(), K)
     points_3d = triangulate_points(pts1_final, pts2_final, P1, P2)
 
-    # Filter by cheirality (depth > 0 in both cameras)
-    R1 = np.eye(3)
-    t1 = np.zeros(3)
-    valid_mask = np.ones(len(points_3d), dtype=bool)
-
-    # Check finite and reasonable magnitude (filter extreme values before operations)
-    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
-        finite_mask = np.all(np.isfinite(points_3d), axis=1)
-        magnitude_mask = np.linalg.norm(points_3d, axis=1) < 1000  # Filter extremely distant points
-        valid_mask &= finite_mask & magnitude_mask
-
-        # Only process valid points
-        if np.any(valid_mask):
-            points_3d_finite = points_3d[valid_mask]
-
-            # Check depth in camera 1
-            points_cam1 = (R1 @ points_3d_finite.T).T + t1
-            depth_mask1 = points_cam1[:, 2] > 0
-
-            # Update valid_mask
-            valid_indices = np.where(valid_mask)[0]
-            valid_mask[valid_indices[~depth_mask1]] = False
-
-        if np.any(valid_mask):
-            points_3d_finite = points_3d[valid_mask]
+    # Keep finite, not extremely distant points in front of both cameras
+    valid_mask = cheirality_mask(points_3d, (np.eye(3), R), (np.zeros(3), t), max_dist=1000.0)
 
-            # Check depth in camera 2
-            points_cam2 = (R @ points_3d_finite.T).T + t.ravel()
-            depth_mask2 = points_cam2[:, 2] > 0
-
-            # Update valid_mask
-            valid_indices = np.where(valid_mask)[0]
-            valid_mask[valid_indices[~depth_mask2]] = False
-
-    # Filter
+    # Filter; both masks compose into one index array over the input matches
     points_3d_final = points_3d[valid_mask]
-    match_indices_final = match_indices[valid_mask]
+    kept = np.flatnonzero(pose_mask)[valid_mask]
+    match_indices_final = kept if match_indices is None else match_indices[kept]
 
     return TwoViewReconstruction(
         R=R,
@@ -160,3 +237,54 @@ def reconstruct_two_views(
         points3d=points_3d_final,
         match_indices=match_indices_final
     )
+
+
+def cached_reconstruct_two_views(
+    pts1: np.ndarray,
+    pts2: np.ndarray,
+    K: np.ndarray,
+    match_indices: np.ndarray | None = None,
+    cache_dir: str | Path = "cache/two_view",
+) -> TwoViewReconstruction:
+    """
+    reconstruct_two_views memoized on disk.
+
+    The cache key hashes the actual inputs (points, K, match indices), so any
+    change in images, detector or matching produces a new entry.
+
+    Args:
+        pts1: Nx2 points in image 1
+        pts2: Nx2 points in image 2
+        K: 3x3 intrinsic matrix
+        match_indices: Optional indices of matches
+        cache_dir: Directory holding the .npz cache files
+
+    Returns:
+        TwoViewReconstruction object
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for arr in (pts1, pts2, K, match_indices if match_indices is not None else np.empty(0)):
+        arr = np.ascontiguousarray(arr)
+        h.update(repr((arr.dtype.str, arr.shape)).encode())
+        h.update(arr.tobytes())
+    cache_file = Path(cache_dir) / f"{h.hexdigest()}.npz"
+
+    if cache_file.exists():
+        with np.load(cache_file) as data:
+            return TwoViewReconstruction(
+                R=data['R'], t=data['t'], points3d=data['points3d'], match_indices=data['match_indices']
+            )
+
+    reconstruction = reconstruct_two_views(pts1, pts2, K, match_indices=match_indices)
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    # A private temp file per writer, so concurrent writers of one entry can't interleave
+    with tempfile.NamedTemporaryFile(dir=cache_file.parent, suffix='.tmp.npz', delete=False) as tmp:
+        np.savez(
+            tmp,
+            R=reconstruction.R,
+            t=reconstruction.t,
+            points3d=reconstruction.points3d,
+            match_indices=reconstruction.match_indices,
+        )
+    os.replace(tmp.name, cache_file)  # never leave a half-written entry behind
+    return reconstruction
@@ -4,10 +4,12 @@ import cv2
 import numpy as np
 from typing import Tuple, Optional
 
+from .two_view_geometry import cheirality_mask
+
 
 def estimate_essential_matrix(pts1: np.ndarray, pts2: np.ndarray, K: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
     """
-    Estimate essential matrix using RANSAC.
+    Estimate essential matrix using USAC MAGSAC++.
 
     Args:
         pts1: Nx2 points in image 1
@@ -17,7 +19,9 @@ def estimate_essential_matrix(pts1: np.ndarray, pts2: np.ndarray, K: np.ndarray)
     Returns:
         Tuple of (essential_matrix, inlier_mask)
     """
-    E, mask = cv2.findEssentialMat(pts1, pts2, K, method=cv2.RANSAC, prob=0.999, threshold=1.0)
+    # MAGSAC++ scores models by marginalizing over the noise scale and refines
+    # the winner, so it needs fewer iterations than plain RANSAC
+    E, mask = cv2.findEssentialMat(pts1, pts2, K, method=cv2.USAC_MAGSAC, prob=0.999, threshold=1.0)
     return E, mask.ravel().astype(bool)
 
 
@@ -69,32 +73,4 @@ def filter_points_by_cheirality(points_3d: np.ndarray, R1: np.ndarray, t1: np.nd
     Returns:
         Boolean mask of valid points
     """
-    valid_mask = np.ones(len(points_3d), dtype=bool)
-
-    # Check for finite values
-    finite_mask = np.all(np.isfinite(points_3d), axis=1)
-    valid_mask &= finite_mask
-
-    if not np.any(valid_mask):
-        return valid_mask
-
-    # Transform points to camera 1 frame
-    points_cam1 = (R1 @ points_3d[valid_mask].T).T + t1.ravel()
-    depth_mask1 = points_cam1[:, 2] > 0
-
-    # Update mask
-    valid_indices = np.where(valid_mask)[0]
-    valid_mask[valid_indices[~depth_mask1]] = False
-
-    if not np.any(valid_mask):
-        return valid_mask
-
-    # Transform points to camera 2 frame
-    points_cam2 = (R2 @ points_3d[valid_mask].T).T + t2.ravel()
-    depth_mask2 = points_cam2[:, 2] > 0
-
-    # Update mask again
-    valid_indices = np.where(valid_mask)[0]
-    valid_mask[valid_indices[~depth_mask2]] = False
-
-    return valid_mask
+    return cheirality_mask(points_3d, (R1, R2), (t1, t2))
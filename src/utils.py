@@ -2,14 +2,117 @@
 
 from __future__ import annotations
 
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 from pathlib import Path
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:  # orjson is optional; compact stdlib json is used instead
+    HAS_ORJSON = False
 
 if TYPE_CHECKING:
     from .incremental_sfm import IncrementalMapper
 
 
+# Binary PLY vertex record matching the header properties; NumPy packs fields
+# without padding, so each record is exactly 15 bytes (3 x float32 + 3 x uint8)
+PLY_VERTEX_DTYPE = np.dtype([
+    ('x', '<f4'), ('y', '<f4'), ('z', '<f4'),
+    ('red', 'u1'), ('green', 'u1'), ('blue', 'u1'),
+])
+
+# OpenCV (y down, z forward) -> Three.js (y up, z back) is diag(1, -1, -1);
+# apply it as a sign multiply instead of a matmul
+FLIP_SIGNS = np.array([1.0, -1.0, -1.0])
+
+# Threads used to link/copy image files into the export bundle
+COPY_WORKERS = 8
+
+
+def _json_default(obj):
+    """Serialize NumPy arrays/scalars for the stdlib json fallback."""
+    if isinstance(obj, (np.ndarray, np.generic)):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def write_json(payload: Dict, path: Path) -> None:
+    """Write payload as compact JSON, serializing NumPy arrays directly when orjson is available."""
+    if HAS_ORJSON:
+        path.write_bytes(orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY))
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, separators=(",", ":"), ensure_ascii=False, default=_json_default)
+
+
+def _copy(src: Path, dst: Path) -> None:
+    """Hard-link src to dst when both are on the same filesystem, else copy contents only."""
+    if dst.exists():
+        if dst.samefile(src):
+            return
+        dst.unlink()
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def copy_files(pairs: List[Tuple[Path, Path]]) -> None:
+    """Copy (src, dst) pairs concurrently; file copies are pure I/O."""
+    by_dst = {dst: src for src, dst in pairs}  # one writer per destination
+    with ThreadPoolExecutor(max_workers=COPY_WORKERS) as pool:
+        list(pool.map(_copy, by_dst.values(), by_dst.keys()))
+
+
+def top_k_by_count(adj: List[Tuple[int, int]], top_k: int) -> List[int]:
+    """Ids of the top_k (id, count) entries by count, highest first."""
+    if top_k <= 0 or not adj:
+        return []
+    ids = np.fromiter((nid for nid, _ in adj), dtype=np.int64, count=len(adj))
+    cnts = np.fromiter((cnt for _, cnt in adj), dtype=np.int64, count=len(adj))
+    if len(adj) > top_k:
+        top = np.argpartition(-cnts, top_k - 1)[:top_k]
+    else:
+        top = np.arange(len(adj))
+    # only the selected entries are sorted
+    top = top[np.argsort(-cnts[top], kind="stable")]
+    return ids[top].tolist()
+
+
+def list_images(directory: str, exts: tuple[str, ...] = ('.jpeg', '.jpg', '.png')) -> list[str]:
+    """
+    Image files in a directory, in lexical order.
+
+    One os.scandir pass filtered by suffix; returns the same paths (and order)
+    as sorted(glob(f"{directory}/*{ext}")) over the extensions, without
+    fnmatch per entry. Hidden files are skipped and a missing directory
+    yields an empty list, as with glob.
+
+    Args:
+        directory: Directory to list (not recursive)
+        exts: Accepted file name suffixes (case-sensitive)
+
+    Returns:
+        Sorted list of paths joined onto directory
+    """
+    try:
+        entries = os.scandir(directory)
+    except FileNotFoundError:
+        return []
+    with entries:
+        return sorted(
+            entry.path for entry in entries
+            if entry.name.endswith(exts) and not entry.name.startswith('.') and entry.is_file()
+        )
+
+
 def save_point_cloud_ply(points: np.ndarray, colors: np.ndarray, output_path: str, verbose: bool = False):
     """
     Save point cloud to PLY format.
@@ -31,29 +134,30 @@ def save_point_cloud_ply(points: np.ndarray, colors: np.ndarray, output_path: st
             colors = (colors * 255).astype(np.uint8)
         else:
             colors = colors.astype(np.uint8)
+    colors = np.asarray(colors, dtype=np.uint8)
 
-    # Build all lines as a list first (much faster than individual writes)
-    lines = [
-        "ply\n",
-        "format ascii 1.0\n",
-        f"element vertex {len(points)}\n",
-        "property float x\n",
-        "property float y\n",
-        "property float z\n",
-        "property uchar red\n",
-        "property uchar green\n",
-        "property uchar blue\n",
+    header = (
+        "ply\n"
+        "format ascii 1.0\n"
+        f"element vertex {len(points)}\n"
+        "property float x\n"
+        "property float y\n"
+        "property float z\n"
+        "property uchar red\n"
+        "property uchar green\n"
+        "property uchar blue\n"
         "end_header\n"
-    ]
-    
-    # Pre-format all vertex lines
-    for point, color in zip(points, colors):
-        lines.append(f"{point[0]:.6f} {point[1]:.6f} {point[2]:.6f} "
-                    f"{int(color[0])} {int(color[1])} {int(color[2])}\n")
-    
+    )
+
+    # Format every vertex with a single %-operation over one repeated row
+    # template, keeping the per-row work in C rather than an interpreted loop
+    values = np.hstack([np.asarray(points, dtype=np.float64), colors]).ravel().tolist()
+    body = ("%.6f %.6f %.6f %d %d %d\n" * len(points)) % tuple(values)
+
     # Write everything at once
     with open(output_path, 'w') as f:
-        f.writelines(lines)
+        f.write(header)
+        f.write(body)
     
     if verbose:
         print(f"✓ Saved successfully")
@@ -69,8 +173,6 @@ def save_point_cloud_ply_binary(points: np.ndarray, colors: np.ndarray, output_p
         output_path: Path to save PLY file
         verbose: Print progress messages
     """
-    import struct
-    
     if verbose:
         print(f"Saving {len(points)} points to {output_path} (binary)...")
     
@@ -97,31 +199,41 @@ def save_point_cloud_ply_binary(points: np.ndarray, colors: np.ndarray, output_p
         "end_header\n"
     )
     
+    # Fill all vertex records (3 floats x,y,z + 3 unsigned chars r,g,b) at once
+    points = np.asarray(points).reshape(-1, 3)
+    colors = np.asarray(colors).reshape(-1, 3)
+    vertices = np.empty(len(points), dtype=PLY_VERTEX_DTYPE)
+    for i, name in enumerate(('x', 'y', 'z')):
+        vertices[name] = points[:, i]
+    for i, name in enumerate(('red', 'green', 'blue')):
+        vertices[name] = colors[:, i]
+
     with open(output_path, 'wb') as f:
         # Write ASCII header
         f.write(header.encode('ascii'))
         
         # Write binary data
-        for point, color in zip(points, colors):
-            # Pack as: 3 floats (x,y,z) + 3 unsigned chars (r,g,b)
-            f.write(struct.pack('fffBBB', 
-                              point[0], point[1], point[2],
-                              int(color[0]), int(color[1]), int(color[2])))
+        vertices.tofile(f)
     
     if verbose:
         print(f"✓ Saved successfully (binary format)")
 
 
-def export_mapper_to_ply(mapper: IncrementalMapper, output_path: str):
+def export_mapper_to_ply(mapper: IncrementalMapper, output_path: str, binary: bool = True):
     """
     Export IncrementalMapper point cloud to PLY file.
 
     Args:
         mapper: IncrementalMapper object
         output_path: Path to save PLY file
+        binary: Write packed binary_little_endian records (default); False
+            writes the human-readable ASCII format
     """
     points, colors = mapper.export_points()
-    save_point_cloud_ply(points, colors, output_path)
+    if binary:
+        save_point_cloud_ply_binary(points, colors, output_path)
+    else:
+        save_point_cloud_ply(points, colors, output_path)
 
 
 def compute_reprojection_error(points_3d: np.ndarray, points_2d: np.ndarray,
@@ -169,11 +281,19 @@ def get_point_cloud_stats(points: np.ndarray) -> dict:
             'range': np.zeros(3)
         }
 
+    # Each reduction runs once: range reuses min/max, std reuses the mean
+    points = np.asarray(points)
+    n = len(points)
+    mn = points.min(axis=0)
+    mx = points.max(axis=0)
+    mean = np.einsum('ij->j', points, dtype=np.float64) / n
+    centered = points - mean
+    std = np.sqrt(np.einsum('ij,ij->j', centered, centered) / n)
     return {
-        'count': len(points),
-        'mean': np.mean(points, axis=0),
-        'std': np.std(points, axis=0),
-        'min': np.min(points, axis=0),
-        'max': np.max(points, axis=0),
-        'range': np.ptp(points, axis=0)
+        'count': n,
+        'mean': mean,
+        'std': std,
+        'min': mn,
+        'max': mx,
+        'range': mx - mn
     }
@@ -1,74 +1,180 @@
 """Quick test of the Week 3 SfM pipeline."""
 
+import argparse
+import cProfile
+import pickle
+import pstats
 import sys
-import cv2
-import numpy as np
-from glob import glob
 from pathlib import Path
 
 # Import modules
-from src.camera import build_intrinsic_matrix
-from src.feature_matching import FeatureMatcher, match_features
-from src.two_view_geometry import FeatureSet, reconstruct_two_views
+from src.camera import build_intrinsic_matrix, read_image
+from src.feature_matching import FeatureMatcher, cached_detect_batch, match_features
+from src.two_view_geometry import FeatureSet, cached_reconstruct_two_views
 from src.incremental_sfm import IncrementalMapper, ImageFeatures
 from src.bundle_adjustment import run_bundle_adjustment
-from src.utils import export_mapper_to_ply, get_point_cloud_stats
+from src.utils import get_point_cloud_stats, list_images, save_point_cloud_ply_binary
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Quick test of the Week 3 SfM pipeline.")
+    parser.add_argument(
+        "--detector", choices=["SIFT", "ORB"], default="SIFT",
+        help="Feature detector; ORB is several times faster and matched by Hamming distance",
+    )
+    parser.add_argument(
+        "--max-features", type=int, default=4000,
+        help="Keep at most this many keypoints per image (strongest first); 0 keeps all",
+    )
+    parser.add_argument(
+        "--max-dimension", type=int, default=1600,
+        help="Downscale images so their longer edge is at most this many pixels "
+             "before detection; 0 keeps full resolution",
+    )
+    parser.add_argument(
+        "--views", type=int, default=2,
+        help="Images to reconstruct: the test pair plus the views nearest to it, "
+             "registered incrementally with one bundle adjustment per batch",
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=8,
+        help="Views registered between two bundle adjustments when --views > 2",
+    )
+    parser.add_argument(
+        "--full-decode", action="store_true",
+        help="Decode images at full resolution before downscaling instead of "
+             "letting libjpeg decode at reduced size",
+    )
+    parser.add_argument(
+        "--profile", nargs="?", const="test_pipeline.prof", metavar="FILE",
+        help="Run under cProfile, write the stats to FILE (default: %(const)s) "
+             "and print the top entries by cumulative time",
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="Load the mapper saved after bundle adjustment (output/week3/mapper.pkl) "
+             "and go straight to export",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.profile:
+        return run_pipeline(args)
+
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(run_pipeline, args)
+    finally:
+        profiler.dump_stats(args.profile)
+        print(f"\nProfile written to {args.profile}")
+        pstats.Stats(args.profile).sort_stats("cumulative").print_stats(30)
+
+
+def run_pipeline(args):
     print("Testing Week 3 SfM Pipeline\n" + "="*50)
 
+    output_dir = Path("output/week3")
+    checkpoint = output_dir / "mapper.pkl"
+    if args.resume and checkpoint.exists():
+        with open(checkpoint, "rb") as f:
+            mapper = pickle.load(f)
+        print(f"✓ Resumed mapper from {checkpoint}")
+        print(f"  Cameras: {len(mapper.cameras)}, Points: {len(mapper.tracks)}")
+    else:
+        if args.resume:
+            print(f"  No checkpoint at {checkpoint}; running the full pipeline")
+        mapper = reconstruct(args)
+        if mapper is None:
+            return
+        output_dir.mkdir(parents=True, exist_ok=True)
+        with open(checkpoint, "wb") as f:
+            pickle.dump(mapper, f, protocol=pickle.HIGHEST_PROTOCOL)
+        print(f"✓ Saved mapper checkpoint to {checkpoint}")
+
+    # Export point cloud
+    ply_path = output_dir / "test_reconstruction.ply"
+    # One export feeds both the PLY writer and the statistics
+    points, colors = mapper.export_points()
+    save_point_cloud_ply_binary(points, colors, str(ply_path))
+    print(f"✓ Exported point cloud to {ply_path}")
+
+    # Print statistics
+    stats = get_point_cloud_stats(points)
+    print(f"\nPoint Cloud Statistics:")
+    print(f"  Count: {stats['count']}")
+    print(f"  Mean:  [{stats['mean'][0]:.2f}, {stats['mean'][1]:.2f}, {stats['mean'][2]:.2f}]")
+    print(f"  Range: [{stats['range'][0]:.2f}, {stats['range'][1]:.2f}, {stats['range'][2]:.2f}]")
+
+    print("\n" + "="*50)
+    print("✓ All tests passed!")
+    return 0
+
+
+def reconstruct(args):
+    """Detect, match, reconstruct the test pair, bundle-adjust it and register any
+    extra views (--views); None if images are missing."""
     # Load images
     DATA_DIR = "Data"
-    image_paths = sorted(glob(f"{DATA_DIR}/*.jpeg"))
+    max_dimension = args.max_dimension or None  # long-edge cap for detection; None keeps full resolution
+    image_paths = list_images(DATA_DIR, exts=(".jpeg",))
     print(f"✓ Found {len(image_paths)} images")
 
     if len(image_paths) < 2:
         print("❌ Need at least 2 images")
         return
 
-    # Load first two images for testing
-    img1 = cv2.imread(image_paths[9])
-    img2 = cv2.imread(image_paths[10])
+    # The test pair (images 9 and 10), then the other images nearest to it in capture order
+    pair = [9, 10]
+    others = sorted(
+        (i for i in range(len(image_paths)) if i not in pair),
+        key=lambda i: min(abs(i - j) for j in pair),
+    )
+    view_paths = [image_paths[i] for i in pair + others[:max(args.views - 2, 0)]]
+
+    # JPEGs are decoded directly at 1/2, 1/4 or 1/8 size when that still fits max_dimension
+    fast_decode = not args.full_decode
+    decoded = [read_image(path, max_dimension, fast_decode=fast_decode) for path in view_paths]
+    images = [image for image, _ in decoded]
+    img1, img2 = images[:2]
+    scale = decoded[0][1]
     h, w = img1.shape[:2]
+    print(f"✓ Image size: {round(w / scale)}x{round(h / scale)} (processing at {w}x{h}, scale {scale:.2f})")
 
-    # Build intrinsic matrix
+    # Build intrinsic matrix from the processed size so K matches the keypoints
     K = build_intrinsic_matrix(w, h)
     print(f"✓ Built intrinsic matrix (focal length: {K[0,0]:.0f})")
 
     # Detect features
     print("✓ Detecting features...")
-    matcher = FeatureMatcher(detector_type='SIFT')
+    matcher = FeatureMatcher(detector_type=args.detector, max_features=args.max_features or None)
 
-    kp1, desc1 = matcher.detect_and_compute(img1)
-    kp2, desc2 = matcher.detect_and_compute(img2)
-    print(f"  Image 1: {len(kp1)} features")
-    print(f"  Image 2: {len(kp2)} features")
+    # Features are cached under cache/features, keyed by image file and detector.
+    # SIFT releases the GIL, so the images are processed on a thread pool
+    features = cached_detect_batch(
+        view_paths, matcher, images=images, max_dimension=max_dimension, fast_decode=fast_decode,
+    )
+    feature_sets = [FeatureSet(keypoints=kp, descriptors=desc) for kp, desc in features]
+    for i, feats in enumerate(feature_sets, 1):
+        print(f"  Image {i}: {len(feats.keypoints)} features")
 
     # Match features
-    feats1 = FeatureSet(keypoints=kp1, descriptors=desc1)
-    feats2 = FeatureSet(keypoints=kp2, descriptors=desc2)
-    match_result = match_features(feats1, feats2)
-    print(f"✓ Matched {len(match_result.matches)} features")
+    feats1, feats2 = feature_sets[:2]
+    match_result = match_features(feats1, feats2, matcher=matcher)
+    print(f"✓ Matched {len(match_result.idx1)} features")
 
     # Two-view reconstruction
     print("✓ Reconstructing two views...")
-    reconstruction = reconstruct_two_views(
-        match_result.pts1,
-        match_result.pts2,
-        K,
-        match_indices=np.arange(len(match_result.matches))
-    )
+    # Cached under cache/two_view, keyed by the matched points and K
+    reconstruction = cached_reconstruct_two_views(match_result.pts1, match_result.pts2, K)
     print(f"  Created {len(reconstruction.points3d)} 3D points")
 
     # Initialize mapper
     print("✓ Initializing IncrementalMapper...")
-    mapper = IncrementalMapper(K=K, min_pnp_points=40)
-
-    img_feats1 = ImageFeatures(feature_set=feats1, image=img1)
-    img_feats2 = ImageFeatures(feature_set=feats2, image=img2)
+    mapper = IncrementalMapper(K=K, min_pnp_points=40, matcher=matcher)
 
-    mapper.register_image(0, img_feats1)
-    mapper.register_image(1, img_feats2)
+    for idx, (feats, image) in enumerate(zip(feature_sets, images)):
+        mapper.register_image(idx, ImageFeatures(feature_set=feats, image=image))
 
     mapper.initialize_from_pair(0, 1, reconstruction, match_result)
     print(f"  Cameras: {len(mapper.cameras)}, Points: {len(mapper.tracks)}")
@@ -79,24 +185,16 @@ def main():
     print(f"  Initial RMSE: {initial_rmse:.3f} pixels")
     print(f"  Final RMSE:   {final_rmse:.3f} pixels")
 
-    # Export point cloud
-    output_dir = Path("output/week3")
-    output_dir.mkdir(parents=True, exist_ok=True)
-    ply_path = output_dir / "test_reconstruction.ply"
-    export_mapper_to_ply(mapper, str(ply_path))
-    print(f"✓ Exported point cloud to {ply_path}")
-
-    # Print statistics
-    points, colors = mapper.export_points()
-    stats = get_point_cloud_stats(points)
-    print(f"\nPoint Cloud Statistics:")
-    print(f"  Count: {stats['count']}")
-    print(f"  Mean:  [{stats['mean'][0]:.2f}, {stats['mean'][1]:.2f}, {stats['mean'][2]:.2f}]")
-    print(f"  Range: [{stats['range'][0]:.2f}, {stats['range'][1]:.2f}, {stats['range'][2]:.2f}]")
+    if len(view_paths) > 2:
+        # One BA per batch of views instead of one per view, plus a final full BA
+        print(f"✓ Registering {len(view_paths) - 2} more views (BA every {args.batch_size})...")
+        registered = mapper.register_views_batched(
+            list(range(2, len(view_paths))), batch_size=args.batch_size, verbose=True
+        )
+        print(f"  Registered {len(registered)}/{len(view_paths) - 2} views")
+        print(f"  Cameras: {len(mapper.cameras)}, Points: {len(mapper.tracks)}")
+    return mapper
 
-    print("\n" + "="*50)
-    print("✓ All tests passed!")
-    return 0
 
 if __name__ == "__main__":
     sys.exit(main())